@@ -0,0 +1,45 @@
+"""
+Benchmarks for the execute package hot paths.
+Each module exposes a run() function that returns a dict of measurements and can be executed directly,
+e.g. `python -m benchmarks.bench_output`
+"""
+import os
+import sys
+import time
+
+
+def cpu_seconds():
+    """
+    :return: user + system cpu seconds consumed by this process so far (all threads)
+    """
+    times = os.times()
+    return times[0] + times[1]
+
+
+def measure(func, *args, **kwargs):
+    """
+    Runs func and measures it
+    :return: a tuple of (func result, wall seconds, cpu seconds of this process)
+    """
+    start_cpu = cpu_seconds()
+    start = time.time()
+    result = func(*args, **kwargs)
+    return result, time.time() - start, cpu_seconds() - start_cpu
+
+
+def print_table(rows, columns):
+    """
+    Prints a list of dicts as an aligned table
+    :param rows: the measurements
+    :param columns: the keys to print, in order
+    """
+    widths = [max([len(c)] + [len(format_value(r.get(c))) for r in rows]) for c in columns]
+    sys.stdout.write("  ".join(c.ljust(w) for c, w in zip(columns, widths)) + "\n")
+    for row in rows:
+        sys.stdout.write("  ".join(format_value(row.get(c)).ljust(w) for c, w in zip(columns, widths)) + "\n")
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return "{:.3f}".format(value)
+    return str(value)
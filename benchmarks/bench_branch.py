@@ -0,0 +1,50 @@
+"""
+get_branch on a repository with many remote branches: 'git branch -a --contains' compared with find_branch_refs
+"""
+import os
+import shutil
+import argparse
+import tempfile
+
+from benchmarks import measure, print_table
+from tests.git_repos import create_history_repo, git
+from execute.git import get_branch
+
+
+def run(commits=500, branches=2000, branch_tips=50, repeat=3):
+    root = tempfile.mkdtemp(prefix="bench_branch_")
+    try:
+        repo = os.path.join(root, "repo")
+        hashes = create_history_repo(repo, commits=commits, branches=branches, branch_tips=branch_tips)
+        oldest_tip = git(repo, "for-each-ref", "--sort=committerdate", "--count=1", "--format=%(objectname)",
+                         "refs/remotes")
+        scenarios = (("checked out branch", "master", hashes[-1]),
+                     ("detached at tip", hashes[-1], hashes[-1]),
+                     ("detached in history", hashes[hashes.index(oldest_tip) - 1],
+                      hashes[hashes.index(oldest_tip) - 1]))
+        results = []
+        for scenario, checkout, commit in scenarios:
+            git(repo, "checkout", "-q", checkout)
+            answers = {}
+            for mode, fast in (("contains", False), ("fast", True)):
+                for _ in range(repeat):
+                    answer, wall, cpu = measure(get_branch, commit, cwd=repo, fast=fast)
+                    answers[mode] = answer
+                    results.append({"scenario": scenario, "mode": mode, "branch": answer, "wall_sec": wall,
+                                    "cpu_sec": cpu})
+            for result in results[-2 * repeat:]:
+                result["same"] = answers["contains"] == answers["fast"]
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--commits", type=int, default=500)
+    parser.add_argument("--branches", type=int, default=2000)
+    parser.add_argument("--branch-tips", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print_table(run(args.commits, args.branches, args.branch_tips, args.repeat),
+                ["scenario", "mode", "branch", "same", "wall_sec", "cpu_sec"])
@@ -0,0 +1,62 @@
+"""
+get_output / get_output_lines / get_tail_lines on large captures, in memory, tail capture and file backed
+"""
+import os
+import gc
+import time
+import shutil
+import argparse
+import tempfile
+
+from benchmarks import measure, print_table
+from execute import Execute
+from execute.capture import CAPTURE_FULL, CAPTURE_TAIL
+
+CALLS = (("get_output", lambda e: e.get_output()),
+         ("get_output excluding header", lambda e: e.get_output(exclude_command=True, exclude_cwd=True)),
+         ("get_output_lines", lambda e: e.get_output_lines(exclude_command=True, exclude_cwd=True)),
+         ("get_tail_lines", lambda e: e.get_tail_lines(5)))
+
+
+def captured(lines, line_size, capture=CAPTURE_FULL, output_path=None):
+    """
+    Builds an Execute result holding a large output, without running a process
+    """
+    execute = Execute(console=False, capture=capture)
+    execute.prepare(["generate", "output"], output_path)
+    execute.start_time = time.time()
+    chunk = ("x" * line_size + "\n").encode("utf-8") * 1000
+    for _ in range(lines // 1000):
+        execute.feed(chunk)
+    execute.feed(b'', final=True)
+    execute.flush()
+    return execute
+
+
+def run(lines=500000, line_size=80, repeat=3):
+    output_dir = tempfile.mkdtemp(prefix="bench_get_output_")
+    results = []
+    try:
+        for storage, capture, output_path in (("memory", CAPTURE_FULL, None), ("tail", CAPTURE_TAIL, None),
+                                              ("file", CAPTURE_FULL, os.path.join(output_dir, "out.log"))):
+            execute = captured(lines, line_size, capture, output_path)
+            for name, call in CALLS:
+                for _ in range(repeat):
+                    execute.output_content = None  # nothing cached from the previous call
+                    gc.collect()
+                    _, wall, cpu = measure(call, execute)
+                    results.append({"storage": storage, "call": name, "lines": lines, "wall_sec": wall,
+                                    "cpu_sec": cpu})
+            execute.close()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=500000)
+    parser.add_argument("--line-size", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print_table(run(args.lines, args.line_size, args.repeat), ["storage", "call", "lines", "wall_sec", "cpu_sec"])
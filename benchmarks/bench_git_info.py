@@ -0,0 +1,74 @@
+"""
+get_info on a generated superproject: batched metadata collection compared with a git call per field,
+and concurrent submodules collection
+"""
+import shutil
+import argparse
+import tempfile
+
+import execute.git
+from benchmarks import measure, print_table
+from tests.git_repos import create_superproject
+
+
+class GitCallCounter(object):
+    def __init__(self):
+        self.calls = 0
+        self.run_git = execute.git.run_git
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.run_git(*args, **kwargs)
+
+    def __enter__(self):
+        execute.git.run_git = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        execute.git.run_git = self.run_git
+
+
+class GitReaderSwitch(object):
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.previous = execute.git.USE_GIT_READER
+
+    def __enter__(self):
+        execute.git.USE_GIT_READER = self.enabled
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        execute.git.USE_GIT_READER = self.previous
+
+
+def run(submodules=10, branches=200, tags=20, repeat=3, max_workers=8, **get_info_kwargs):
+    root = tempfile.mkdtemp(prefix="bench_git_info_")
+    try:
+        project = create_superproject(root, submodules=submodules, branches=branches, tags=tags)
+        results = []
+        # name, get_info arguments, whether read-only queries are answered in-process by GitReader
+        modes = (("per field git only", {"batched": False}, False), ("batched git only", {"batched": True}, False),
+                 ("per field", {"batched": False}, True), ("batched", {"batched": True}, True),
+                 ("concurrent", {"batched": True, "max_workers": max_workers}, True))
+        for name, kwargs, reader in modes:
+            kwargs.update(get_info_kwargs)
+            for _ in range(repeat):
+                with GitCallCounter() as counter, GitReaderSwitch(reader):
+                    info, wall, cpu = measure(execute.git.get_info, project, **kwargs)
+                results.append({"mode": name, "projects": submodules + 1, "git_calls": counter.calls,
+                                "wall_sec": wall, "cpu_sec": cpu, "json": info.to_json()})
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--submodules", type=int, default=10)
+    parser.add_argument("--branches", type=int, default=200)
+    parser.add_argument("--tags", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-workers", type=int, default=8)
+    args = parser.parse_args()
+    print_table(run(args.submodules, args.branches, args.tags, args.repeat, args.max_workers),
+                ["mode", "projects", "git_calls", "wall_sec", "cpu_sec"])
@@ -0,0 +1,46 @@
+"""
+Repeated tag queries (get_tag_hash, get_tag_date): a git process per query compared with a GitSession
+"""
+import os
+import shutil
+import argparse
+import tempfile
+
+import execute.git
+from benchmarks import measure, print_table
+from benchmarks.bench_git_info import GitReaderSwitch
+from tests.git_repos import create_repo
+from execute.git_session import GitSession
+
+
+def query_tags(repo, tags, session=None):
+    return [(execute.git.get_tag_hash(tag, repo, session=session), execute.git.get_tag_date(repo, tag, session=session))
+            for tag in tags]
+
+
+def run(tags=50, repeat=3):
+    root = tempfile.mkdtemp(prefix="bench_git_session_")
+    try:
+        repo = create_repo(os.path.join(root, "repo"), commits=tags, tags=tags)
+        names = ["release_{:03d}".format(i) for i in range(tags)]
+        results = []
+        with GitReaderSwitch(False):
+            for mode in ("run_git", "session"):
+                for _ in range(repeat):
+                    session = GitSession(repo) if mode == "session" else None
+                    answers, wall, cpu = measure(query_tags, repo, names, session)
+                    if session is not None:
+                        session.close()
+                    results.append({"mode": mode, "queries": 2 * tags, "per_query_ms": wall * 1000 / (2 * tags),
+                                    "wall_sec": wall, "cpu_sec": cpu})
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    print_table(run(args.tags, args.repeat), ["mode", "queries", "per_query_ms", "wall_sec", "cpu_sec"])
@@ -0,0 +1,89 @@
+"""
+Output throughput of Execute.read_process: the chunked pump compared with the legacy poll()/readline loop,
+the capture modes of the pump compared with each other, and flushing the output file on every write
+compared with a buffered WritePolicy
+"""
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+
+from benchmarks import measure, print_table
+from execute import Execute, read_stream_lines
+from execute.capture import CAPTURE_FULL, CAPTURE_BYTES, CAPTURE_NONE
+from execute.exceptions import ExecuteTimeout
+from execute.sinks import buffered
+
+WRITER = "import sys\n" \
+         "line = b'x' * {line_size} + b'\\n'\n" \
+         "out = getattr(sys.stdout, 'buffer', sys.stdout)\n" \
+         "for _ in range({count}):\n" \
+         "    out.write(line)\n" \
+         "    {flush}\n"
+
+
+class LegacyExecute(Execute):
+    """
+    Execute with the read loop the library used before the output pump
+    """
+
+    def read_process(self, stream):
+        if self.running_process is not None:
+            while self.running_process.poll() is None:
+                lines = read_stream_lines(stream, 2)
+                self.write(lines)
+
+            lines = read_stream_lines(stream, 20)
+            while lines:
+                self.write(lines)
+                lines = read_stream_lines(stream, 20)
+                if self.exception and isinstance(self.exception, ExecuteTimeout):
+                    break
+
+
+# name, Execute class, capture mode, whether the output goes to a file, write policy
+ENGINES = (("legacy", LegacyExecute, CAPTURE_FULL, False, None),
+           ("pump", Execute, CAPTURE_FULL, False, None),
+           ("pump-bytes", Execute, CAPTURE_BYTES, False, None),
+           ("pump-none", Execute, CAPTURE_NONE, False, None),
+           ("pump-file", Execute, CAPTURE_FULL, True, None),
+           ("pump-file-buffered", Execute, CAPTURE_FULL, True, buffered()))
+
+
+def run_writer(execute_class, line_size, total_mb, capture=CAPTURE_FULL, output_path=None, write_policy=None,
+               flush_lines=False):
+    count = int(total_mb * 1024 * 1024 / (line_size + 1))
+    execute = execute_class(console=False, capture=capture, write_policy=write_policy)
+    flush = "out.flush()" if flush_lines else "pass"
+    execute.execute([sys.executable, "-c", WRITER.format(line_size=line_size, count=count, flush=flush)], output_path)
+    return execute
+
+
+def run(line_sizes=(16, 128, 1024, 64 * 1024), total_mb=32, flush_lines=False, repeat=1):
+    results = []
+    output_dir = tempfile.mkdtemp()
+    try:
+        for line_size in line_sizes:
+            for name, execute_class, capture, to_file, write_policy in ENGINES:
+                output_path = os.path.join(output_dir, "{}.log".format(name)) if to_file else None
+                for _ in range(repeat):
+                    _, wall, cpu = measure(run_writer, execute_class, line_size, total_mb, capture, output_path,
+                                           write_policy, flush_lines)
+                    results.append({"engine": name, "line_size": line_size, "mb": total_mb,
+                                    "mb_per_sec": total_mb / wall, "wall_sec": wall, "cpu_sec": cpu})
+    finally:
+        shutil.rmtree(output_dir)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=float, default=32, help="megabytes written by the child per run")
+    parser.add_argument("--line-sizes", type=int, nargs="+", default=[16, 128, 1024, 64 * 1024])
+    parser.add_argument("--flush-lines", action="store_true",
+                        help="the child flushes every line, as a slow producer (or a line buffered one) does")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+    print_table(run(args.line_sizes, args.mb, args.flush_lines, args.repeat),
+                ["engine", "line_size", "mb", "mb_per_sec", "wall_sec", "cpu_sec"])
@@ -0,0 +1,83 @@
+"""
+Spawn overhead of run(): the time per command of a trivial command, compared with a bare subprocess.Popen,
+and how the spawn rate changes with the memory held by the parent (--rss-mb grows the parent by a ballast)
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+from benchmarks import measure, print_table
+from execute import run as execute_run
+
+# a command that exits right away, so the time measured is the overhead of starting and collecting it
+TRIVIAL_CMD = ["true"] if sys.platform != "win32" else [sys.executable, "-c", "pass"]
+
+
+def parent_rss_mb():
+    """
+    :return: the current resident memory of this process in MB (the peak where the current one is not available)
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024.0 * 1024)
+    except (IOError, OSError, ValueError):
+        import resource
+        from execute.stats import MAX_RSS_UNIT
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * MAX_RSS_UNIT / (1024.0 * 1024)
+
+
+def popen(cmd):
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    process.communicate()
+    return process.returncode
+
+
+def popen_fork(cmd):
+    # a preexec_fn forces a plain fork, the parent memory mappings are copied for every command
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, preexec_fn=lambda: None)
+    process.communicate()
+    return process.returncode
+
+
+def spawn(cmd):
+    return execute_run(cmd, console=False).return_code
+
+
+def spawn_fast(cmd):
+    return execute_run(cmd, console=False, fast_spawn=True).return_code
+
+
+MODES = [("popen", popen), ("run", spawn), ("run_fast", spawn_fast)]
+if os.name != 'nt':
+    MODES.insert(0, ("popen_fork", popen_fork))
+
+
+def run(count=100, repeat=3, cmd=None, rss_mb=(0,)):
+    """
+    :param rss_mb: sizes of the memory ballast the parent holds while spawning, one measurement round per size
+    """
+    cmd = cmd or TRIVIAL_CMD
+    results = []
+    for ballast_mb in rss_mb:
+        ballast = b"\x01" * (ballast_mb * 1024 * 1024)  # written, so its pages are resident
+        rss = parent_rss_mb()
+        for mode, func in MODES:
+            for _ in range(repeat):
+                _, wall, cpu = measure(lambda: [func(cmd) for _ in range(count)])
+                results.append({"mode": mode, "rss_mb": int(rss), "commands": count,
+                                "spawns_per_sec": count / wall, "per_command_ms": wall * 1000 / count,
+                                "wall_sec": wall, "cpu_sec": cpu})
+        del ballast
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100, help="commands spawned per run")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rss-mb", type=int, nargs="+", default=[0],
+                        help="parent memory ballast sizes to measure with (e.g. 0 1024 4096)")
+    args = parser.parse_args()
+    print_table(run(args.count, args.repeat, rss_mb=args.rss_mb),
+                ["mode", "rss_mb", "commands", "spawns_per_sec", "per_command_ms", "wall_sec", "cpu_sec"])
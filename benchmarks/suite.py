@@ -0,0 +1,146 @@
+"""
+Runs the benchmarks that track the performance of the library and compares them with a baseline file.
+Every metric is the best (lowest) wall time of its repeats in seconds, a metric that got slower than its
+baseline by more than the threshold is a regression and fails the run.
+
+    python -m benchmarks.suite                     # compare with benchmarks/baseline.json
+    python -m benchmarks.suite --update-baseline   # record the current machine as the baseline
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+
+from benchmarks import print_table
+from benchmarks import bench_spawn, bench_output, bench_get_output, bench_git_info, bench_branch
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 0.3
+
+
+def best_of(rows, keys, value="wall_sec"):
+    """
+    Reduces benchmark rows to metrics, named by the values of keys, keeping the lowest value of the repeats
+    """
+    metrics = {}
+    for row in rows:
+        name = ".".join(str(row[key]).replace(" ", "_") for key in keys)
+        metrics[name] = min(metrics.get(name, row[value]), row[value])
+    return metrics
+
+
+def spawn_suite():
+    return best_of(bench_spawn.run(count=50, repeat=5), ["mode"])
+
+
+def output_suite():
+    return best_of(bench_output.run(line_sizes=(128, 64 * 1024), total_mb=8, repeat=3), ["engine", "line_size"])
+
+
+def get_output_suite():
+    return best_of(bench_get_output.run(lines=200000, repeat=5), ["storage", "call"])
+
+
+def git_info_suite():
+    return best_of(bench_git_info.run(submodules=5, branches=50, tags=10, repeat=3), ["mode"])
+
+
+def branch_suite():
+    return best_of(bench_branch.run(commits=200, branches=500, branch_tips=20, repeat=3), ["scenario", "mode"])
+
+
+SUITES = [("spawn", spawn_suite), ("output", output_suite), ("get_output", get_output_suite),
+          ("git_info", git_info_suite), ("branch", branch_suite)]
+
+
+def machine_info():
+    return {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()}
+
+
+def run(suites=None):
+    """
+    :param suites: names of the suites to run, all of them by default
+    :return: a dict of metric name to seconds
+    """
+    metrics = {}
+    for name, suite in SUITES:
+        if suites and name not in suites:
+            continue
+        for metric, value in suite().items():
+            metrics["{}.{}".format(name, metric)] = value
+    return metrics
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(metrics, path=BASELINE_PATH):
+    with open(path, "w") as baseline_file:
+        json.dump({"machine": machine_info(), "metrics": metrics}, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write("\n")
+
+
+def compare(metrics, baseline, threshold=DEFAULT_THRESHOLD, min_delta_sec=0.005):
+    """
+    Compares metrics with the baseline metrics
+    :param threshold: the relative slowdown that counts as a regression
+    :param min_delta_sec: slowdowns smaller than this are ignored, they are measurement noise for tiny metrics
+    :return: a tuple of the comparison rows and the names of the regressed metrics
+    """
+    rows = []
+    regressions = []
+    for name in sorted(metrics):
+        value = metrics[name]
+        base = baseline.get(name)
+        row = {"metric": name, "sec": value, "baseline": base, "change": "", "status": "new"}
+        if base:
+            change = (value - base) / base
+            row["change"] = "{:+.0%}".format(change)
+            row["status"] = "ok"
+            if change > threshold and value - base > min_delta_sec:
+                row["status"] = "REGRESSION"
+                regressions.append(name)
+        rows.append(row)
+    return rows, regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="the baseline file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown that fails the run (default %(default)s)")
+    parser.add_argument("--suites", nargs="+", choices=[name for name, _ in SUITES], help="run only these suites")
+    parser.add_argument("--update-baseline", action="store_true", help="save the results as the baseline")
+    args = parser.parse_args(args)
+
+    metrics = run(args.suites)
+    baseline = load_baseline(args.baseline)
+    if args.update_baseline:
+        if baseline is not None and args.suites:  # keep the metrics of the suites that were not run
+            baseline["metrics"].update(metrics)
+            metrics = baseline["metrics"]
+        save_baseline(metrics, args.baseline)
+        print_table([{"metric": name, "sec": value} for name, value in sorted(metrics.items())], ["metric", "sec"])
+        return 0
+
+    if baseline is None:
+        print_table([{"metric": name, "sec": value} for name, value in sorted(metrics.items())], ["metric", "sec"])
+        print("no baseline at {}, run with --update-baseline to create it".format(args.baseline))
+        return 0
+    if baseline.get("machine") != machine_info():
+        print("the baseline was recorded on another machine ({}), expect differences".format(baseline.get("machine")))
+    rows, regressions = compare(metrics, baseline["metrics"], args.threshold)
+    print_table(rows, ["metric", "sec", "baseline", "change", "status"])
+    if regressions:
+        print("{} metrics regressed by more than {:.0%}".format(len(regressions), args.threshold))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
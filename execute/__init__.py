@@ -1,11 +1,34 @@
 import os
+import sys
+import codecs
 import subprocess
-import threading
 import platform
 import shlex
 import time
+import errno
+import shutil
+import signal
+import threading
+from collections import deque
+
+try:
+    from collections import ChainMap
+    from functools import lru_cache
+except ImportError:  # python 2
+    ChainMap = None
+
+    def lru_cache(maxsize=128):
+        return lambda func: func
 
+from execute.capture import TailBuffer, BytesBuffer, NullBuffer, CAPTURE_FULL, CAPTURE_TAIL, CAPTURE_BYTES, \
+    CAPTURE_NONE, DEFAULT_TAIL_BYTES
+from execute.command_cache import get_command_cache
 from execute.exceptions import ExecuteTimeout
+from execute.log_file import LogFile
+from execute.pump import OutputPump
+from execute.scheduler import get_scheduler, Escalation, KILL_SIGNAL
+from execute.sinks import BufferedSink, WritePolicy, get_console_writer
+from execute.stats import ExecuteStats, get_metrics
 from execute.utils import create_dir_for_file
 
 if platform.python_version().split(".")[0] == '2':
@@ -42,35 +65,180 @@ def read_stream_lines(stream, lines_count=1):
         return lines
 
 
+def split_command(cmd):
+    """
+    :return: the command as a list of arguments, a string is split by spaces (or as a shell would when it has quotes)
+    """
+    if isinstance(cmd, str):
+        return list(split_command_string(cmd))
+    return cmd
+
+
+@lru_cache(maxsize=1024)
+def split_command_string(cmd):
+    # the same command strings are run over and over (e.g. by run_git), so they are parsed once
+    if "\"" in cmd:
+        return tuple(shlex.split(cmd))
+    return tuple(cmd.split(" "))
+
+
+@lru_cache(maxsize=256)
+def find_executable(name, path):
+    """
+    Resolves a bare command name on the PATH, cached per name and PATH (a program installed after the lookup is
+    found only if it is not shadowed by an earlier result)
+    :return: the executable path, None if it is not found
+    """
+    return shutil.which(name, path=path)
+
+
+def overlay_env(env):
+    """
+    :param env: environment variables to set on top of the process environment
+    :return: the environment to start a command with: None (inherit the process environment) when there is nothing
+             to override, otherwise a copy-on-write overlay of the overrides over os.environ
+    """
+    if env is None or not isinstance(env, dict) or not env:
+        return None
+    if ChainMap is None:
+        p_env = os.environ.copy()
+        p_env.update(env)
+        return p_env
+    return ChainMap(dict(env), os.environ)
+
+
+_running_lock = threading.Lock()
+_running = set()
+
+
+def kill_windows_group(process, sig):
+    """
+    Stops a command started with CREATE_NEW_PROCESS_GROUP and the processes it started: a kill ends the whole
+    process tree, any other signal is sent to the group as CTRL_BREAK_EVENT
+    """
+    if sig == KILL_SIGNAL:
+        subprocess.call(["taskkill", "/F", "/T", "/PID", str(process.pid)], stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL)
+    else:
+        process.send_signal(signal.CTRL_BREAK_EVENT)
+
+
+def kill_all(sig=KILL_SIGNAL):
+    """
+    Signals every running command of the process (their process groups, for commands in process group mode),
+    e.g. to tear everything down at shutdown
+    :return: the number of commands signaled
+    """
+    with _running_lock:
+        executes = list(_running)
+    for execute in executes:
+        execute.send_signal(sig)
+    return len(executes)
+
+
 class Execute(object):
-    def __init__(self, output=None, console=True):
+    def __init__(self, output=None, console=True, capture=CAPTURE_FULL, max_bytes=DEFAULT_TAIL_BYTES,
+                 escalation=None, on_line=None, spool_bytes=None, write_policy=None, process_group=False,
+                 fast_spawn=False):
+        """
+        :param output: the output file path (in-memory output if None)
+        :param console: whether to print the output
+        :param capture: CAPTURE_FULL keeps all the output, CAPTURE_TAIL keeps only the last max_bytes of it in
+                        memory (the full output is still written to the output file when given),
+                        CAPTURE_BYTES keeps the raw output bytes and decodes them only when get_output is called,
+                        CAPTURE_NONE keeps nothing in memory (the raw output is still written to the output file)
+        :param max_bytes: size of the output kept by CAPTURE_TAIL, in characters
+        :param escalation: how to stop the process on timeout (an Escalation, kills it right away by default)
+        :param spool_bytes: size of raw output CAPTURE_BYTES keeps in memory before moving it to a temporary file
+                            (None keeps all of it in memory)
+        :param on_line: a callable that gets each output line of the process (without the cwd and command header
+                        and the line break) as soon as it is read, it may call kill() to abort the process
+        :param write_policy: when the output file is flushed and how the console is written (a WritePolicy,
+                             flushes on every write by default)
+        :param process_group: run the command in its own process group (a new session on posix), so kill, the
+                              timeout escalation and kill_all signal everything it started and not just the
+                              command itself
+        :param fast_spawn: start the command with vfork or posix_spawn where possible (see fast_spawn_options),
+                           for parents with a large memory footprint
+        """
         self.running_process = None
         self.command = None
         self.output_stream = None
         self.output_path = output
         self.console = console
+        self.capture = capture
+        self.max_bytes = max_bytes
+        self.spool_bytes = spool_bytes
+        self.write_policy = write_policy if write_policy is not None else WritePolicy()
+        self.sink = None
+        self.escalation = escalation if escalation is not None else Escalation()
         self.return_code = None
         self.output_content = None
         self.start_time = None
         self.end_time = None
         self.duration = 0
+        self.stats = ExecuteStats()
+        self.reap_lock = threading.Lock()
         self.exception = None
+        self.pump = None
+        self.decoder = None
+        self.on_line = on_line
+        self.lines = None
+        self.partial_line = ""
+        self.header_ends = (0, 0)
+        self.output_offset = 0
+        self.log_file = None
+        self.process_group = process_group
+        self.fast_spawn = fast_spawn
+        self.cached = False
 
     def read_process(self, stream):
         if self.running_process is not None:
-            while self.running_process.poll() is None:
-                lines = read_stream_lines(stream, 2)
-                self.write(lines)
-
-            lines = read_stream_lines(stream, 20)
-            while lines:
-                self.write(lines)
-                lines = read_stream_lines(stream, 20)
-                if self.exception and isinstance(self.exception, ExecuteTimeout):
-                    break
+            self.pump = OutputPump()
+            try:
+                self.pump.register(stream, self.feed)
+                self.pump.run()
+            finally:
+                self.pump.close()
+
+    def feed(self, chunk, final=False):
+        """
+        Decodes a chunk of raw process output and writes it, a multi-byte character split between chunks
+        is kept by the decoder until the rest of it arrives
+        :param chunk: the bytes read from the process
+        :param final: whether this is the last chunk of the process output
+        """
+        if chunk:
+            self.stats.on_output(chunk, time.time() - self.start_time)
+        if self.is_raw():
+            self.write_bytes(chunk)
+            if self.on_line is None and self.lines is None:
+                return
+            text = self.decoder.decode(chunk, final)
+        else:
+            text = self.decoder.decode(chunk, final)
+            self.write(text)
+        if self.on_line is not None or self.lines is not None:
+            self.split_lines(text, final)
+
+    def split_lines(self, text, final=False):
+        lines = (self.partial_line + text).split("\n")
+        self.partial_line = lines.pop()
+        if final and self.partial_line:
+            lines.append(self.partial_line)
+            self.partial_line = ""
+        for line in lines:
+            line = line.rstrip("\r")
+            if self.lines is not None:
+                self.lines.append(line)
+            if self.on_line is not None:
+                self.on_line(line)
 
     def close(self):
         self.output_stream.close()
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
 
     def get_command_as_str(self):
         cmd = self.command
@@ -78,102 +246,481 @@ class Execute(object):
             cmd = " ".join(cmd)
         return cmd
 
+    def is_raw(self):
+        """
+        :return: True if the output is kept as raw bytes (it is decoded only when asked for)
+        """
+        return self.capture in (CAPTURE_BYTES, CAPTURE_NONE)
+
+    def write_console(self, data):
+        if self.write_policy.console_thread:
+            get_console_writer().write(data)
+        else:
+            console = getattr(sys.stdout, "buffer", sys.stdout) if isinstance(data, bytes) else sys.stdout
+            console.write(data)
+            console.flush()
+
+    def write_bytes(self, data):
+        if data:
+            if self.console:
+                self.write_console(data)
+            self.sink.write(data)
+
     def write(self, line):
-        if line:
+        if line and self.is_raw():
+            self.write_bytes(line.encode("utf-8"))
+        elif line:
             if self.console:
-                print(line)
-            self.output_stream.write(line)
-            self.output_stream.flush()
+                self.write_console(line)
+            self.sink.write(line)
+
+    def flush(self):
+        """
+        Flushes output that the write policy still holds, to the output file and to the console
+        """
+        if self.sink is not None:
+            self.sink.flush()
+        if self.console and self.write_policy.console_thread:
+            get_console_writer().wait()
 
     def get_output(self, strip=True, exclude_command=False, exclude_cwd=False):
         if self.output_content is None:
-            if isinstance(self.output_stream, StringIO):  # in case working with IO object
+            if isinstance(self.output_stream, TailBuffer):  # in case only the tail of the output is kept
+                self.output_offset, self.output_content = self.output_stream.getvalue_with_offset()
+            elif isinstance(self.output_stream, StringIO):  # in case working with IO object
                 self.output_content = self.output_stream.getvalue()
+            elif self.is_raw():  # in case the raw output is kept, it is decoded only now
+                self.output_content = bytes(self.get_output_bytes()).decode("utf-8", "replace")
             elif self.output_path is not None:  # in case working with actual file
                 with open(self.output_path, "r") as out:
                     self.output_content = out.read()
             self.output_content = str(self.output_content)
         output = self.output_content
-        if exclude_command:
-            cmd = self.get_command_as_str()
-            output = output.replace(cmd, "", 1)
-        if exclude_cwd and "running in " in output:
-            first_newline_index = output.index("\n")
-            output = output[first_newline_index + 1:]
+        if exclude_command or exclude_cwd:
+            output = self.exclude_header(output, exclude_command, exclude_cwd)
 
         if strip:
             output = output.strip()
         return output
 
+    def get_output_bytes(self):
+        """
+        Gets the raw output of CAPTURE_BYTES (or of the output file of CAPTURE_NONE) without decoding it
+        :return: a memoryview of the output bytes, including the cwd and command header
+        """
+        if isinstance(self.output_stream, (BytesBuffer, NullBuffer)):
+            return self.output_stream.getbuffer()
+        if self.output_path is not None:
+            if self.sink is not None:
+                self.sink.flush()
+            with open(self.output_path, "rb") as out:
+                return memoryview(out.read())
+        return memoryview(b'')
+
+    def exclude_header(self, output, exclude_command, exclude_cwd):
+        """
+        Cuts the header lines out of the output by the positions they were written at
+        """
+        cwd_end, command_end = self.header_ends
+        cut_start = 0 if exclude_cwd else cwd_end
+        cut_end = command_end if exclude_command else cwd_end
+        # the output may start after the header (or in the middle of it) when only its tail is kept
+        cut_start = max(cut_start - self.output_offset, 0)
+        cut_end = max(cut_end - self.output_offset, 0)
+        if cut_start == cut_end:
+            return output
+        return output[:cut_start] + output[cut_end:]
+
     def get_output_lines(self, strip=True, exclude_command=False, exclude_cwd=False):
         return self.get_output(strip=strip, exclude_command=exclude_command, exclude_cwd=exclude_cwd).splitlines()
 
+    def get_tail_lines(self, count, strip=True):
+        """
+        Gets the last lines of the output, without going over all of it when only its tail is kept
+        :param count: the number of lines
+        :param strip: whether to ignore trailing white spaces
+        :return: a list of up to count lines
+        """
+        if self.output_content is None and isinstance(self.output_stream, TailBuffer):
+            return self.output_stream.tail_lines(count, strip=strip)
+        if self.output_content is None and self.output_path is not None:
+            return self.get_log().tail(count, strip=strip)
+        return self.get_output_lines(strip=strip)[-count:]
+
+    def get_log(self):
+        """
+        Gives mmap based access to the output file (tail, grep and indexed lines), without reading all of it.
+        The line index of the LogFile is kept, so it is built only once for this output.
+        :return: a LogFile of the output file, or None if the output is not written to a file
+        """
+        if self.output_path is None:
+            return None
+        if self.sink is not None:
+            self.sink.flush()
+        if self.log_file is None:
+            self.log_file = LogFile(self.output_path)
+        return self.log_file
+
     def kill(self):
-        self.running_process.kill()
+        self.send_signal(KILL_SIGNAL)
+
+    def send_signal(self, sig):
+        with self.reap_lock:
+            process = self.running_process
+            if process is None:
+                return
+            if self.is_group_signaled():
+                # the group outlives its leader as long as processes the command started are running,
+                # they may be holding the output pipe open
+                try:
+                    os.killpg(process.pid, sig)
+                except OSError as e:  # the group is gone
+                    if e.errno not in (errno.ESRCH, errno.EPERM):
+                        raise
+                return
+            if process.returncode is not None:
+                return
+            if os.name == 'nt' or not isinstance(process, subprocess.Popen):
+                if self.process_group and os.name == 'nt':
+                    kill_windows_group(process, sig)
+                elif sig == KILL_SIGNAL:
+                    process.kill()
+                else:
+                    process.send_signal(sig)
+            else:
+                # not Popen.send_signal, it reaps the process (so its resource usage would be lost)
+                try:
+                    os.kill(process.pid, sig)
+                except OSError as e:  # the process already exited
+                    if e.errno != errno.ESRCH:
+                        raise
+
+    def is_group_signaled(self):
+        """
+        :return: whether signals are sent to the process group of the command (until its output was collected)
+        """
+        return self.process_group and os.name != 'nt' and isinstance(self.running_process, subprocess.Popen) and \
+            self.end_time is None
+
+    def group_alive(self):
+        """
+        :return: whether a process of the command group is still running (False when not in process group mode)
+        """
+        if not self.is_group_signaled():
+            return False
+        try:
+            os.killpg(self.running_process.pid, 0)
+        except OSError as e:
+            return e.errno == errno.EPERM
+        return True
+
+    def fast_spawn_options(self, cwd, env, options):
+        """
+        Sets the Popen options that let subprocess start the command without copying the parent memory mappings,
+        so the spawn cost does not grow with the parent RSS. Where subprocess uses vfork (linux, python 3.10+)
+        nothing has to change. Otherwise the command is set up for posix_spawn: an executable path, no fds closing
+        (fds python opens are not inherited anyway, PEP 446) and no cwd change.
+        :return: the cwd to pass to Popen
+        """
+        if os.name == 'nt' or getattr(subprocess, "_USE_VFORK", False):
+            return cwd
+        options["close_fds"] = False
+        name = self.command[0]
+        if not os.path.dirname(name):
+            path = (env if env is not None else os.environ).get("PATH", os.defpath)
+            executable = find_executable(name, path)
+            if executable is not None:
+                options["executable"] = executable
+        if os.path.abspath(cwd) == os.getcwd():
+            return None
+        return cwd
+
+    def popen_options(self):
+        """
+        :return: the extra Popen arguments of the process group mode
+        """
+        if not self.process_group:
+            return {}
+        if os.name == 'nt':
+            return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        if is_py_3:
+            return {"start_new_session": True}
+        return {"preexec_fn": os.setsid}
+
+    def can_wait4(self):
+        return hasattr(os, "wait4") and isinstance(self.running_process, subprocess.Popen)
+
+    def poll_process(self):
+        """
+        Checks whether the process exited without waiting for it, reaping it with its resource usage
+        :return: the return code, None if the process is still running
+        """
+        with self.reap_lock:
+            process = self.running_process
+            if process.returncode is not None or not self.can_wait4():
+                return process.poll()
+            try:
+                pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+            except OSError as e:  # reaped elsewhere
+                if e.errno != errno.ECHILD:
+                    raise
+                return process.poll()
+            if pid == 0:
+                return None
+            self.set_exit_status(status, rusage)
+            return process.returncode
+
+    def wait_process(self):
+        """
+        Waits for the process to exit, reaping it with its resource usage
+        :return: the return code
+        """
+        process = self.running_process
+        if not self.can_wait4():
+            return process.wait()
+        if process.returncode is None:
+            # the lock is not held while waiting, so the process can still be signaled by the timeout
+            try:
+                if hasattr(os, "waitid"):
+                    # waits without reaping, the pid stays valid for send_signal until it is reaped under the lock
+                    os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+                    with self.reap_lock:
+                        if process.returncode is None:
+                            _, status, rusage = os.wait4(process.pid, 0)
+                            self.set_exit_status(status, rusage)
+                        return process.returncode
+                _, status, rusage = os.wait4(process.pid, 0)
+            except OSError as e:  # reaped by poll_process
+                if e.errno != errno.ECHILD:
+                    raise
+                with self.reap_lock:
+                    return process.poll()
+            with self.reap_lock:
+                self.set_exit_status(status, rusage)
+        return process.returncode
+
+    def set_exit_status(self, status, rusage):
+        if os.WIFSIGNALED(status):
+            self.running_process.returncode = -os.WTERMSIG(status)
+        else:
+            self.running_process.returncode = os.WEXITSTATUS(status)
+        self.stats.set_rusage(rusage)
 
     def __kill_by_timeout__(self):
-        self.kill()
         self.exception = ExecuteTimeout(execute_result=self)
+        self.escalate(0)
+
+    def escalate(self, step):
+        """
+        Sends the signal of the given escalation step and schedules the next step.
+        Once the last signal was sent (or the process exited) the output is no longer waited for,
+        in case the pipe is held open by processes it started.
+        :param step: the index of the signal in the escalation
+        """
+        if self.running_process is None:
+            return
+        if step == 0 or self.poll_process() is None or self.group_alive():
+            self.send_signal(self.escalation.signals[step])
+            if step + 1 < len(self.escalation.signals):
+                get_scheduler().schedule(self.escalation.grace_sec, self.escalate, step + 1)
+                return
+        if self.pump is not None:
+            self.pump.stop()
 
     def timed_out(self):
         return self.exception is not None and isinstance(self.exception, ExecuteTimeout)
 
-    def execute(self, cmd, output_full_path=None, cwd=None, env=None, timeout_sec=7200):
-        self.command = cmd
-        if isinstance(cmd, str):
-            if "\"" in self.command:
-                self.command = shlex.split(self.command)
-            else:
-                self.command = cmd.split(" ")
+    def prepare(self, cmd, output_full_path=None, cwd=None, env=None):
+        """
+        Parses the command, opens the output and writes its header
+        :return: a tuple of the working directory and the environment to run the command with
+        """
+        self.command = split_command(cmd)
         if self.output_stream is not None:
             self.close()
 
         if isinstance(output_full_path, StringIO):
             self.output_stream = output_full_path
         elif output_full_path is None:
-            self.output_stream = StringIO()
+            if self.capture == CAPTURE_TAIL:
+                self.output_stream = TailBuffer(self.max_bytes)
+            elif self.capture == CAPTURE_BYTES:
+                self.output_stream = BytesBuffer(self.spool_bytes)
+            elif self.capture == CAPTURE_NONE:
+                self.output_stream = NullBuffer()
+            else:
+                self.output_stream = StringIO()
         else:
             self.output_path = output_full_path
             create_dir_for_file(output_full_path)
-            self.output_stream = open(output_full_path, "w")
+            buffering = self.write_policy.buffer_size if self.write_policy.is_buffered() else -1
+            self.output_stream = open(output_full_path, "wb" if self.is_raw() else "w", buffering)
+            if self.capture == CAPTURE_TAIL:
+                self.output_stream = TailBuffer(self.max_bytes, self.output_stream)
+
+        self.sink = BufferedSink(self.output_stream, self.write_policy)
 
         if cwd is None:
             cwd = os.getcwd()
-        self.write("running in {}\n".format(cwd))
-
-        self.write("{}\n".format(" ".join(self.command)))
-
-        p_env = os.environ.copy()
-
-        if env is not None and isinstance(env, dict):
-            for k, v in env.items():
-                p_env[k] = v
-        timer = threading.Timer(timeout_sec, self.__kill_by_timeout__)
+        cwd_header = "running in {}\n".format(cwd)
+        command_header = "{}\n".format(" ".join(self.command))
+        self.write(cwd_header)
+        self.write(command_header)
+        self.header_ends = (len(cwd_header), len(cwd_header) + len(command_header))
+
+        p_env = overlay_env(env)
+
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        return cwd, p_env
+
+    def start(self, cmd, output_full_path=None, cwd=None, env=None):
+        """
+        Prepares the output and spawns the command without waiting for it.
+        The caller is responsible to read running_process.stdout into feed() and to call finish()
+        :return: the running process
+        """
+        # the results of a previous run of this Execute
+        self.return_code = None
+        self.output_content = None
+        self.output_offset = 0
+        self.partial_line = ""
+        self.end_time = None
+        self.duration = 0
+        self.stats = ExecuteStats()
+        self.exception = None
+        self.cached = False
+        cwd, p_env = self.prepare(cmd, output_full_path, cwd=cwd, env=env)
+        self.start_time = time.time()
+        options = self.popen_options()
+        if self.fast_spawn:
+            cwd = self.fast_spawn_options(cwd, p_env, options)
+        self.running_process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                                cwd=cwd, env=p_env, **options)
+        with _running_lock:
+            _running.add(self)
+        return self.running_process
+
+    def finish(self):
+        """
+        Collects the results of a process that its output was fully read and that exited
+        :return: the process return code
+        """
+        if self.decoder is not None:
+            self.feed(b'', final=True)
+        self.flush()
+        with _running_lock:
+            _running.discard(self)
+        self.end_time = time.time()
+        self.duration = self.end_time - self.start_time
+        self.stats.wall_sec = self.duration
+        if self.running_process is not None:
+            if isinstance(self.running_process, subprocess.Popen) and self.running_process.stdout is not None:
+                self.running_process.stdout.close()
+            self.return_code = self.running_process.returncode
+        return self.return_code
 
+    def iter_lines(self, cmd, output_full_path=None, cwd=None, env=None, timeout_sec=7200):
+        """
+        Runs the command like execute, yielding its output lines (without the cwd and command header and the line
+        breaks) while it runs. Closing the generator before the output ended kills the process.
+        The results of the command are valid once the generator is done.
+        """
+        self.lines = lines = deque()
+        timeout_call = None
         self.start_time = time.time()
 
         try:
-            self.running_process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                                    cwd=cwd, env=p_env)
-
-            out_t = threading.Thread(target=self.read_process, args=(self.running_process.stdout,))
-            timer.start()
-            out_t.start()
-            out_t.join()
+            self.start(cmd, output_full_path, cwd=cwd, env=env)
+            timeout_call = get_scheduler().schedule(timeout_sec, self.__kill_by_timeout__)
+            self.pump = OutputPump()
+            self.pump.register(self.running_process.stdout, self.feed)
+            for _ in self.pump.iter_steps():
+                while lines:
+                    yield lines.popleft()
+            self.wait_process()
         except Exception as e:
             print(e)
         finally:
-            timer.cancel()
-
-        self.end_time = time.time()
-        self.duration = self.end_time - self.start_time
-        self.return_code = self.running_process.returncode
-        return self.return_code
+            if timeout_call is not None:
+                timeout_call.cancel()
+            if self.pump is not None:
+                self.pump.close()
+            if self.running_process is not None and self.poll_process() is None:
+                self.kill()
+                self.wait_process()
+            self.finish()
+            self.lines = None
+
+        while lines:
+            yield lines.popleft()
+
+    def restore(self, entry):
+        """
+        Fills the results of the command from a CommandCache entry instead of running it
+        """
+        self.command = entry["command"]
+        self.output_stream = StringIO(entry["output"])
+        self.output_content = entry["output"]
+        self.header_ends = tuple(entry["header_ends"])
+        self.return_code = entry["return_code"]
+        self.start_time = self.end_time = time.time()
+        self.cached = True
+        if self.console:
+            self.write_console(entry["output"])
+
+    def cache_entry(self, cwd):
+        """
+        :return: the CommandCache entry of the command results
+        """
+        return {"command": self.command, "cwd": cwd, "return_code": self.return_code,
+                "output": self.get_output(strip=False), "header_ends": list(self.header_ends)}
 
+    def execute(self, cmd, output_full_path=None, cwd=None, env=None, timeout_sec=7200):
+        timeout_call = None
+        self.start_time = time.time()
 
-def run(cmd, output_path=None, console=True, cwd=None, env=None, check_output=False, timeout_sec=7200):
-    execute = Execute(console=console)
+        try:
+            self.start(cmd, output_full_path, cwd=cwd, env=env)
+            timeout_call = get_scheduler().schedule(timeout_sec, self.__kill_by_timeout__)
+            self.read_process(self.running_process.stdout)
+            self.wait_process()
+        except Exception as e:
+            print(e)
+        finally:
+            if timeout_call is not None:
+                timeout_call.cancel()
+
+        return self.finish()
+
+
+def run(cmd, output_path=None, console=True, cwd=None, env=None, check_output=False, timeout_sec=7200,
+        capture=CAPTURE_FULL, max_bytes=DEFAULT_TAIL_BYTES, escalation=None, on_line=None, spool_bytes=None,
+        write_policy=None, process_group=False, cache=None, cache_files=(), fast_spawn=False):
+    """
+    Runs a command and waits for it, the arguments are of Execute and Execute.execute
+    :param cache: memoize the result of the command: True for the process wide CommandCache, or a CommandCache.
+                  A command that returned 0 is not run again while its result is valid. Only commands with an
+                  in-memory output (no output_path), CAPTURE_FULL and no on_line callback are memoized.
+    :param cache_files: paths of files the command result depends on, the result is run again when they change
+    :return: the Execute results (its cached attribute tells whether it came from the cache)
+    """
+    execute = Execute(console=console, capture=capture, max_bytes=max_bytes, escalation=escalation, on_line=on_line,
+                      spool_bytes=spool_bytes, write_policy=write_policy, process_group=process_group,
+                      fast_spawn=fast_spawn)
+    if cache is True:
+        cache = get_command_cache()
+    key = None
+    if cache and output_path is None and capture == CAPTURE_FULL and on_line is None:
+        cwd = cwd if cwd is not None else os.getcwd()
+        key = cache.key(split_command(cmd), cwd, env, cache_files)
+        entry = cache.get(key)
+        if entry is not None:
+            execute.restore(entry)
+            return execute
     execute.execute(cmd, output_path, cwd=cwd, env=env, timeout_sec=timeout_sec)
+    get_metrics().record(execute)
+    if key is not None and execute.return_code == 0 and execute.exception is None:
+        cache.put(key, execute.cache_entry(cwd))
     if check_output and execute.return_code != 0 and execute.exception is not None:
         raise execute.exception
     return execute
@@ -0,0 +1,113 @@
+"""
+asyncio backend of execute, every command is a child of the running event loop and no thread is used per command.
+On python 3.9 - 3.11 the default child watcher still starts a thread per child, so a pidfd based watcher is
+installed (when the kernel supports it and no other watcher was set), see install_child_watcher.
+"""
+import os
+import sys
+import time
+import asyncio
+import warnings
+
+from execute import Execute
+from execute.capture import CAPTURE_FULL, DEFAULT_TAIL_BYTES
+from execute.exceptions import ExecuteTimeout
+from execute.pump import READ_CHUNK_SIZE
+
+
+def pidfd_supported():
+    if not hasattr(os, "pidfd_open") or not hasattr(asyncio, "PidfdChildWatcher"):
+        return False
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+    except OSError:
+        return False
+    return True
+
+
+def install_child_watcher(loop=None):
+    """
+    Installs a pidfd child watcher bound to the given (or running) loop, so awaiting children needs no threads.
+    Not needed from python 3.12, where the default watcher is already thread-less.
+    :return: True if the watcher was installed
+    """
+    if sys.version_info >= (3, 12) or sys.platform == "win32" or not pidfd_supported():
+        return False
+    loop = loop if loop is not None else asyncio.get_running_loop()
+    watcher = asyncio.PidfdChildWatcher()
+    watcher.attach_loop(loop)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        asyncio.get_event_loop_policy().set_child_watcher(watcher)
+    return True
+
+
+_watched_loop = None
+
+
+def ensure_child_watcher():
+    global _watched_loop
+    if sys.version_info >= (3, 12) or sys.platform == "win32":
+        return
+    loop = asyncio.get_running_loop()
+    if _watched_loop is loop:
+        return
+    policy = asyncio.get_event_loop_policy()
+    # respect a watcher that was set by the application
+    if _watched_loop is None and getattr(policy, "_watcher", None) is not None:
+        return
+    if install_child_watcher(loop):
+        _watched_loop = loop
+
+
+class AsyncExecute(Execute):
+    """
+    Execute built on asyncio.create_subprocess_exec, its results (return_code, get_output, get_output_lines,
+    duration, exception) are the same as of Execute, but execute is a coroutine
+    """
+
+    async def execute(self, cmd, output_full_path=None, cwd=None, env=None, timeout_sec=7200):
+        self.start_time = time.time()
+        try:
+            cwd, p_env = self.prepare(cmd, output_full_path, cwd=cwd, env=env)
+            ensure_child_watcher()
+            self.start_time = time.time()
+            self.running_process = await asyncio.create_subprocess_exec(*self.command,
+                                                                        stdout=asyncio.subprocess.PIPE,
+                                                                        stderr=asyncio.subprocess.STDOUT,
+                                                                        cwd=cwd, env=p_env)
+            try:
+                # one deadline over the output and the exit, a child may close its output and keep running
+                await asyncio.wait_for(self.read_and_wait(), timeout_sec)
+            except asyncio.TimeoutError:
+                self.exception = ExecuteTimeout(execute_result=self)
+                self.kill()
+                await self.running_process.wait()
+        except Exception as e:
+            print(e)
+
+        return self.finish()
+
+    async def read_and_wait(self):
+        await self.read_process(self.running_process.stdout)
+        await self.running_process.wait()
+
+    async def read_process(self, stream):
+        while True:
+            chunk = await stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            self.feed(chunk)
+
+    def kill(self):
+        if self.running_process is not None and self.running_process.returncode is None:
+            self.running_process.kill()
+
+
+async def async_run(cmd, output_path=None, console=True, cwd=None, env=None, check_output=False, timeout_sec=7200,
+                    capture=CAPTURE_FULL, max_bytes=DEFAULT_TAIL_BYTES, on_line=None):
+    execute = AsyncExecute(console=console, capture=capture, max_bytes=max_bytes, on_line=on_line)
+    await execute.execute(cmd, output_path, cwd=cwd, env=env, timeout_sec=timeout_sec)
+    if check_output and execute.return_code != 0 and execute.exception is not None:
+        raise execute.exception
+    return execute
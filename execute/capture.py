@@ -0,0 +1,183 @@
+import mmap
+import tempfile
+from collections import deque
+
+CAPTURE_FULL = "full"
+CAPTURE_TAIL = "tail"
+CAPTURE_BYTES = "bytes"
+CAPTURE_NONE = "none"
+
+DEFAULT_TAIL_BYTES = 1024 * 1024
+
+
+class TailBuffer(object):
+    """
+    A file like object that keeps only the last max_bytes characters written to it (a ring of chunks).
+    Optionally every write is also forwarded to another stream (e.g. a log file), so the full output
+    can be kept on disk without holding it in memory.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_TAIL_BYTES, stream=None):
+        self.max_bytes = max_bytes
+        self.stream = stream
+        self.chunks = deque()
+        self.size = 0
+        self.dropped = 0
+        self.partial_head = False
+
+    def write(self, text):
+        if self.stream is not None:
+            self.stream.write(text)
+        if not text:
+            return
+        self.chunks.append(text)
+        self.size += len(text)
+        self.trim()
+
+    def trim(self):
+        while self.size > self.max_bytes:
+            excess = self.size - self.max_bytes
+            first = self.chunks[0]
+            if len(first) <= excess:
+                self.chunks.popleft()
+                self.size -= len(first)
+                self.dropped += len(first)
+                self.partial_head = first[-1] != "\n"
+            else:
+                self.chunks[0] = first[excess:]
+                self.size -= excess
+                self.dropped += excess
+                self.partial_head = first[excess - 1] != "\n"
+
+    def flush(self):
+        if self.stream is not None:
+            self.stream.flush()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+
+    def truncated(self):
+        """
+        :return: True if part of the output was dropped
+        """
+        return self.dropped > 0
+
+    def getvalue(self):
+        """
+        :return: the kept output, when output was dropped the first (partial) line is omitted
+        """
+        return self.getvalue_with_offset()[1]
+
+    def getvalue_with_offset(self):
+        """
+        :return: a tuple of the position of the kept output within the whole output, and the kept output
+        """
+        text = "".join(self.chunks)
+        offset = self.dropped
+        if self.partial_head:
+            newline_index = text.find("\n")
+            offset += len(text) if newline_index == -1 else newline_index + 1
+            text = "" if newline_index == -1 else text[newline_index + 1:]
+        return offset, text
+
+    def tail_lines(self, count, strip=True):
+        """
+        Gets the last lines of the output, reading only the chunks needed for them
+        :param count: the number of lines
+        :param strip: whether to ignore trailing white spaces of the output (as get_output does)
+        :return: a list of up to count lines
+        """
+        pieces = []
+        # the first chunk is left to getvalue, which handles the partial head and leading white spaces
+        for index in range(len(self.chunks) - 1, 0, -1):
+            pieces.append(self.chunks[index])
+            text = "".join(reversed(pieces))
+            if strip:
+                text = text.rstrip()
+            lines = text.splitlines()
+            # lines before the wanted ones (but the first, it may be partial) must have content,
+            # otherwise stripping the whole output could change the wanted lines
+            if len(lines) > count + 1 and any(line.strip() for line in lines[1:-count]):
+                return lines[-count:]
+
+        lines = self.getvalue()
+        if strip:
+            lines = lines.strip()
+        return lines.splitlines()[-count:]
+
+
+class BytesBuffer(object):
+    """
+    A file like object that keeps the raw output bytes, without decoding them.
+    The bytes are kept in a bytearray, once they grow over spool_bytes they are moved to a temporary file,
+    either way getbuffer exposes them as a memoryview without copying them.
+    """
+
+    def __init__(self, spool_bytes=None):
+        self.spool_bytes = spool_bytes
+        self.data = bytearray()
+        self.file = None
+        self.map = None
+        self.size = 0
+
+    def write(self, data):
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8")
+        if self.map is not None:
+            raise ValueError("Can't write to the buffer while its content is mapped")
+        self.size += len(data)
+        if self.file is not None:
+            self.file.write(data)
+            return
+        self.data += data
+        if self.spool_bytes is not None and self.size > self.spool_bytes:
+            self.file = tempfile.TemporaryFile()
+            self.file.write(self.data)
+            self.data = bytearray()
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def getbuffer(self):
+        """
+        :return: a memoryview of the bytes written so far
+        """
+        if self.file is None:
+            return memoryview(self.data)
+        if self.size == 0:
+            return memoryview(b'')
+        if self.map is None:
+            self.file.flush()
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self.map)
+
+    def close(self):
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:  # a memoryview of the map is still in use, it is released with it
+                pass
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class NullBuffer(object):
+    """
+    A file like object that drops everything written to it
+    """
+
+    def write(self, data):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def getbuffer(self):
+        return memoryview(b'')
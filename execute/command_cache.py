@@ -0,0 +1,166 @@
+"""
+Memoizes the results of commands that are pure functions of their inputs ('git config remote.origin.url',
+'git rev-list -1 <tag>', '--version' probes), so a repeated run returns without starting a process.
+Results are keyed by the command arguments, the working directory, the environment variables the cache
+is told to watch and optionally the stats of files the result depends on.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from execute.utils import create_dir_for_file
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SEC = 600
+
+
+def file_fingerprint(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime, st.st_size]
+
+
+class CommandCache(object):
+    """
+    A memory LRU of command results, backed by a directory of json files when directory is given
+    (a result stored by another process of the pipeline is found there).
+    Only results of commands that returned 0 are stored.
+    :param max_entries: results kept in memory, the least recently used are evicted first
+    :param ttl_sec: seconds a result is valid for, None keeps results until they are evicted
+    :param directory: the on-disk tier, None keeps results in memory only
+    :param env_keys: environment variables that are part of the key (besides the env a command is run with)
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_sec=DEFAULT_TTL_SEC, directory=None, env_keys=()):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.directory = directory
+        self.env_keys = list(env_keys)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stores = 0
+
+    def key(self, command, cwd, env=None, files=()):
+        """
+        :param command: the command as a list of arguments
+        :param cwd: the working directory of the command
+        :param env: the environment variables the command is run with on top of the process environment
+        :param files: paths of files the result depends on, a change in their stats changes the key
+        :return: the key of the command result
+        """
+        watched = dict((key, os.environ.get(key)) for key in self.env_keys)
+        if env:
+            watched.update(env)
+        key = json.dumps([list(command), os.path.abspath(cwd), sorted(watched.items()),
+                          [[path, file_fingerprint(path)] for path in files]])
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        :return: the stored result entry (a dict of command, cwd, return_code, output and header_ends),
+                 None if there is no valid one
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if self.is_valid(entry):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self.entries[key]
+                self.expired += 1
+        entry = self.load(key)
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self.remember(key, entry)
+        return entry
+
+    def put(self, key, entry):
+        entry = dict(entry, created=time.time())
+        with self.lock:
+            self.stores += 1
+            self.remember(key, entry)
+        self.save(key, entry)
+
+    def is_valid(self, entry):
+        return self.ttl_sec is None or time.time() - entry["created"] < self.ttl_sec
+
+    def remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, "{}.json".format(key))
+
+    def load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self.entry_path(key), "r") as entry_file:
+                entry = json.load(entry_file)
+        except (IOError, OSError, ValueError):
+            return None
+        if not self.is_valid(entry):
+            with self.lock:
+                self.expired += 1
+            return None
+        return entry
+
+    def save(self, key, entry):
+        if self.directory is None:
+            return
+        path = self.entry_path(key)
+        create_dir_for_file(path)
+        temp_path = "{}.{}.{}.tmp".format(path, os.getpid(), threading.current_thread().ident)
+        with open(temp_path, "w") as entry_file:
+            json.dump(entry, entry_file)
+        os.replace(temp_path, path)  # readers see the whole entry or none
+
+    def clear(self):
+        """
+        Drops the results in memory and on disk
+        """
+        with self.lock:
+            self.entries.clear()
+        if self.directory is not None and os.path.isdir(self.directory):
+            for file_name in os.listdir(self.directory):
+                if file_name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, file_name))
+
+    def to_dict(self):
+        """
+        :return: the hit and miss statistics of the cache
+        """
+        with self.lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "expired": self.expired,
+                    "stores": self.stores, "entries": len(self.entries)}
+
+
+_command_cache = None
+_command_cache_lock = threading.Lock()
+
+
+def get_command_cache():
+    """
+    :return: the in-memory CommandCache shared by the process, used by run(cache=True)
+    """
+    global _command_cache
+    if _command_cache is None:
+        with _command_cache_lock:
+            if _command_cache is None:
+                _command_cache = CommandCache()
+    return _command_cache
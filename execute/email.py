@@ -1,15 +1,33 @@
+import atexit
 import socket
 import platform
 import smtplib
+import threading
 
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+try:
+    from queue import Queue, Empty, Full
+except ImportError:  # python 2
+    from Queue import Queue, Empty, Full
+
 DEFAULT_SENDER_EMAIL = None
 DEFAULT_SENDER_ALIAS = None
 SMTP_HOST = None
 SMTP_PORT = 0
 
+# errors of the connection itself, a message that failed on them is sent again over a new connection
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, socket.error)
+
+
+def is_connection_error(error):
+    """
+    :return: whether error is of the connection itself, on py3 socket.error is OSError and smtplib.SMTPException
+             subclasses it, so the server's answers (e.g. a refused recipient) are told apart here
+    """
+    return isinstance(error, smtplib.SMTPServerDisconnected) or not isinstance(error, smtplib.SMTPException)
+
 
 def get_env_info():
     host = socket.gethostname()
@@ -21,7 +39,11 @@ def get_env_info():
     """.format(host, python_version, os_info)
 
 
-def send(to, subject, body, sender_email=DEFAULT_SENDER_EMAIL, sender_alias=DEFAULT_SENDER_ALIAS, add_env_info=False):
+def build_message(to, subject, body, sender_email=DEFAULT_SENDER_EMAIL, sender_alias=DEFAULT_SENDER_ALIAS,
+                  add_env_info=False):
+    """
+    :return: a tuple of (sender, recipients, message string) as smtplib's sendmail takes them
+    """
     if add_env_info:
         body = "{}\n\n\n{}".format(body, get_env_info())
 
@@ -36,9 +58,198 @@ def send(to, subject, body, sender_email=DEFAULT_SENDER_EMAIL, sender_alias=DEFA
     part2 = MIMEText(body, 'html')
     message.attach(part1)
     message.attach(part2)
+    return sender, [to], message.as_string()
+
+
+class SmtpConnection(object):
+    """
+    An SMTP connection that is opened on first use and kept for the next messages.
+    A message that fails because the connection dropped (e.g. the server closed an idle connection) is sent
+    again over a new connection.
+    """
+
+    def __init__(self, host=None, port=None, timeout_sec=30, retries=1):
+        self.host = host
+        self.port = port
+        self.timeout_sec = timeout_sec
+        self.retries = retries
+        self.smtp = None
+        self.connects = 0
+
+    def connect(self):
+        if self.smtp is None:
+            self.smtp = smtplib.SMTP(self.host if self.host is not None else SMTP_HOST,
+                                     self.port if self.port is not None else SMTP_PORT, timeout=self.timeout_sec)
+            self.connects += 1
+        return self.smtp
+
+    def sendmail(self, sender, recipients, message):
+        attempt = 0
+        while True:
+            try:
+                return self.connect().sendmail(sender, recipients, message)
+            except CONNECTION_ERRORS as e:
+                if not is_connection_error(e):
+                    raise
+                self.close(quit_server=False)
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+
+    def close(self, quit_server=True):
+        smtp, self.smtp = self.smtp, None
+        if smtp is None:
+            return
+        try:
+            if quit_server:
+                smtp.quit()
+            else:
+                smtp.close()
+        except (smtplib.SMTPException, socket.error):
+            smtp.close()
+
+
+class Mailer(object):
+    """
+    Sends mails from a background thread over one kept SMTP connection, so send() returns right away.
+    Messages waiting in the queue are sent together as a batch over the connection, which is closed once the
+    queue was idle for idle_sec. Use flush() to wait for the queued messages, and close() (or the context manager)
+    when done.
+    :param host: the SMTP server (SMTP_HOST by default)
+    :param port: the SMTP port (SMTP_PORT by default)
+    :param max_queue: maximal number of queued messages, send() blocks while the queue is full
+                      (or drops the message when block is False)
+    :param batch_size: maximal number of messages sent before checking whether the connection should be closed
+    :param idle_sec: seconds without messages after which the connection is closed
+    :param block: whether send() waits for room in a full queue
+    """
+
+    def __init__(self, host=None, port=None, sender_email=None, sender_alias=None, max_queue=1000, batch_size=50,
+                 idle_sec=30, timeout_sec=30, block=True):
+        self.connection = SmtpConnection(host, port, timeout_sec=timeout_sec)
+        self.sender_email = sender_email
+        self.sender_alias = sender_alias
+        self.batch_size = batch_size
+        self.idle_sec = idle_sec
+        self.block = block
+        self.queue = Queue(max_queue)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.errors = []
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def send(self, to, subject, body, add_env_info=False):
+        """
+        Queues a mail, arguments are the same as execute.email.send
+        :return: True if the mail was queued, False if it was dropped since the queue is full
+        """
+        if self.closed:
+            raise RuntimeError("Can't send with a closed mailer")
+        sender_email = self.sender_email if self.sender_email is not None else DEFAULT_SENDER_EMAIL
+        sender_alias = self.sender_alias if self.sender_alias is not None else DEFAULT_SENDER_ALIAS
+        message = build_message(to, subject, body, sender_email, sender_alias, add_env_info)
+        self.start()
+        try:
+            self.queue.put(message, block=self.block)
+        except Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def flush(self):
+        """
+        Waits until all the queued mails were sent (or failed, see errors)
+        """
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        """
+        Sends the queued mails, then stops the sending thread and closes the connection
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+        self.connection.close()
+
+    def start(self):
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    thread = threading.Thread(target=self._run, name="execute-mailer")
+                    thread.daemon = True
+                    thread.start()
+                    self.thread = thread
+
+    def _run(self):
+        while True:
+            try:
+                message = self.queue.get(timeout=self.idle_sec)
+            except Empty:
+                self.connection.close()
+                message = self.queue.get()
+            batch = []
+            while message is not None:
+                batch.append(message)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    message = self.queue.get_nowait()
+                except Empty:
+                    message = False
+                    break
+            self._send_batch(batch)
+            if message is None:
+                self.queue.task_done()
+                return
+
+    def _send_batch(self, batch):
+        for message in batch:
+            try:
+                self.connection.sendmail(*message)
+                with self.lock:
+                    self.sent += 1
+            except Exception as e:  # a failed mail must not stop the ones after it
+                with self.lock:
+                    self.errors.append((message, e))
+            finally:
+                self.queue.task_done()
+
+
+_mailer = None
+_mailer_lock = threading.Lock()
+
+
+def get_mailer():
+    """
+    :return: the Mailer shared by the process (sends to SMTP_HOST and SMTP_PORT), the mails it queued are sent
+             before the process exits
+    """
+    global _mailer
+    if _mailer is None:
+        with _mailer_lock:
+            if _mailer is None:
+                _mailer = Mailer()
+                atexit.register(_mailer.close)
+    return _mailer
+
+
+def send(to, subject, body, sender_email=DEFAULT_SENDER_EMAIL, sender_alias=DEFAULT_SENDER_ALIAS, add_env_info=False):
+    sender, recipients, message = build_message(to, subject, body, sender_email, sender_alias, add_env_info)
     smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
 
     # TODO: logging.debug("Sending mail '{}' to {}".format(subject, to))
-    smtp.sendmail(sender, [to], message.as_string())
+    smtp.sendmail(sender, recipients, message)
     smtp.quit()
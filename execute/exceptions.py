@@ -1,12 +1,13 @@
 class ExecuteException(Exception):
     def __init__(self, message=None, execute_result=None):
         self.execute_result = execute_result
-        self.message = self.get_message() if message is None else message
+        self.message = message
+        if self.message is None:
+            self.message = self.get_message()
         super(ExecuteException, self).__init__(self.message)
 
     def get_details(self):
-        lines = self.execute_result.get_output_lines()
-        return "\n".join(lines[-5:])
+        return "\n".join(self.execute_result.get_tail_lines(5))
 
     def get_message(self):
         if self.message is None:
@@ -22,6 +23,24 @@ class ExecuteException(Exception):
 class ExecuteTimeout(ExecuteException):
     def __init__(self, message=None, execute_result=None):
         super(ExecuteTimeout, self).__init__(message, execute_result)
+
+    def get_message(self):
         if self.message is None:
-            self.message = "Script [Timed-out] {} returned exit code {}".format(' '.join(self.execute_result.command),
-                                                                                self.execute_result.return_code)
+            return "Script [Timed-out] {} returned exit code {}".format(' '.join(self.execute_result.command),
+                                                                        self.execute_result.return_code)
+        else:
+            return self.message
+
+
+class GitReaderUnsupported(Exception):
+    """
+    Raised when the in-process git reader can't answer a query, the caller should ask git instead
+    """
+    pass
+
+
+class GitConfigError(ValueError):
+    """
+    Raised when a git config file (.git/config, .gitmodules) can't be parsed
+    """
+    pass
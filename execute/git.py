@@ -1,65 +1,212 @@
 import re
 import os
 import json
+from json.encoder import encode_basestring_ascii
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from execute import run
-from execute.utils import write_log, get_most_exact, index_of, try_parse_int, fix_path
+from execute.exceptions import GitReaderUnsupported, GitConfigError
+from execute.git_cache import get_fingerprint
+from execute.git_config import read_config
+from execute.git_reader import GitReader
+from execute.git_tags import TagIndex
+from execute.utils import write_log, get_most_exact, fix_path
+
+# answer read-only queries (HEAD, refs, tags, remote url) from the git directory when possible
+USE_GIT_READER = True
+
+BRANCH_NAMESPACES = ["refs/heads", "refs/remotes"]
+# characters of ref names passed to one 'git for-each-ref --contains', well under the 32767 characters of a
+# windows command line
+CONTAINS_REFS_CHARS_PER_CALL = 16 * 1024
+HASH_PATTERN = re.compile(r'^[0-9a-f]{40,64}$')
+DESCRIBE_PATTERN = re.compile(r'^(.+)-(\d+)-g([0-9a-f]{40,64})$')
+
+
+# attribute name, default value (submodules default to a new empty list)
+PROJECT_FIELDS = [("id", None), ("full_path", None), ("full_name", None), ("branch", None), ("parent", None),
+                  ("url", None), ("head_hash", None), ("tag_hash", None), ("last_tag", None), ("next_tag_hash", None),
+                  ("next_tag", None), ("short_summary", None), ("detailed_summary", None), ("submodules", None),
+                  ("status", "freeze")]
+SUBMODULE_FIELDS = [("name", None), ("path", None), ("relative_url", None), ("tracking_branch", None),
+                    ("update", None)]
+JSON_INDENT = 4
 
 
 class GitProject(object):
+    """
+    The git info of a project and its submodules tree. The attributes are slots, so a tree of thousands of
+    modules stays small, and it is serialized to json by streaming (iter_json, dump) instead of building it in
+    one string. to_json output is the same as json.dumps of the attributes (sorted keys, indent 4).
+    """
+    __slots__ = [name for name, _ in PROJECT_FIELDS]
+    FIELDS = PROJECT_FIELDS
+
     def __init__(self, *args, **kwargs):
-        self.id = kwargs.get("id", None)
-        self.full_path = kwargs.get("full_path", None)
-        self.full_name = kwargs.get("full_name", None)
-        self.branch = kwargs.get("branch", None)
-        self.parent = kwargs.get("parent", None)
-        self.url = kwargs.get("url", None)
-        self.head_hash = kwargs.get("head_hash", None)
-        self.tag_hash = kwargs.get("tag_hash", None)
-        self.last_tag = kwargs.get("last_tag", None)
-        self.next_tag_hash = kwargs.get("next_tag_hash", None)
-        self.next_tag = kwargs.get("next_tag", None)
-        self.short_summary = kwargs.get("short_summary", None)
-        self.detailed_summary = kwargs.get("detailed_summary", None)
-        self.submodules = kwargs.get("submodules", [])
-        self.status = kwargs.get("status", "freeze")
+        for name, default in self.FIELDS:
+            setattr(self, name, kwargs.get(name, default))
+        if self.submodules is None:
+            self.submodules = []
+
+    def to_dict(self):
+        """
+        :return: the attributes as a dict, submodules as a list of dicts
+        """
+        data = dict((name, getattr(self, name)) for name, _ in self.FIELDS)
+        data["submodules"] = [module.to_dict() for module in self.submodules]
+        return data
+
+    def iter_json(self, indent=JSON_INDENT, level=0):
+        """
+        Encodes the project tree to json a project at a time
+        :param indent: spaces per nesting level, as json.dumps takes it
+        :return: a generator of json strings
+        """
+        inner = "\n" + " " * (indent * (level + 1))
+        separator = "," + inner
+        before = separator.join('"{}": {}'.format(name, encode_json_value(getattr(self, name), indent, level + 1))
+                                for name in self.NAMES_BEFORE_SUBMODULES)
+        after = separator.join('"{}": {}'.format(name, encode_json_value(getattr(self, name), indent, level + 1))
+                               for name in self.NAMES_AFTER_SUBMODULES)
+        if not self.submodules:
+            yield "{}{}{}{}\"submodules\": []{}{}\n{}}}".format("{", inner, before, separator, separator, after,
+                                                                " " * (indent * level))
+            return
+        module_indent = inner + " " * indent
+        yield "{}{}{}{}\"submodules\": [".format("{", inner, before, separator)
+        module_separator = module_indent
+        for module in self.submodules:
+            yield module_separator
+            module_separator = "," + module_indent
+            for chunk in module.iter_json(indent, level + 2):
+                yield chunk
+        yield "{}]{}{}\n{}}}".format(inner, separator, after, " " * (indent * level))
+
+    def dump(self, fp, indent=JSON_INDENT):
+        """
+        Writes the project tree as json to a file object, without building the whole json string
+        """
+        for chunk in self.iter_json(indent):
+            fp.write(chunk)
 
     def to_json(self):
-        return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True, indent=4)
+        return "".join(self.iter_json())
+
+    @staticmethod
+    def from_dict(data):
+        """
+        Builds a project from its to_dict data, a dict with a path is a GitSubmodule
+        """
+        project = (GitSubmodule if "path" in data else GitProject)(**data)
+        project.submodules = [module if isinstance(module, GitProject) else GitProject.from_dict(module)
+                              for module in project.submodules]
+        return project
+
+    @staticmethod
+    def from_json(content):
+        """
+        Loads a project tree saved by to_json or dump
+        :param content: the json string, or a file object to read it from
+        """
+        if hasattr(content, "read"):
+            return json.load(content, object_hook=project_from_json_object)
+        return json.loads(content, object_hook=project_from_json_object)
 
 
 class GitSubmodule(GitProject):
-    def __init__(self, *args, **kwargs):
-        super(GitSubmodule, self).__init__(*args, **kwargs)
-        self.name = kwargs.get("name", None)
-        self.path = kwargs.get("path", None)
-        self.relative_url = kwargs.get("relative_url", None)
+    __slots__ = [name for name, _ in SUBMODULE_FIELDS]
+    FIELDS = PROJECT_FIELDS + SUBMODULE_FIELDS
 
 
-def run_git(cmd, console=False, cwd=None, log_file=None, check_output=False, timeout_sec=20):
-    result = run(cmd, output_path=log_file, console=console, check_output=check_output, timeout_sec=timeout_sec,
-                 cwd=cwd)
-    output = result.get_output()
-    write_log(log_file, output, console=False)  # maybe can leave it to execute
+def set_json_names(model):
+    # the json keys are sorted, the scalar fields around submodules are encoded as one string each
+    names = sorted(name for name, _ in model.FIELDS)
+    model.NAMES_BEFORE_SUBMODULES = names[:names.index("submodules")]
+    model.NAMES_AFTER_SUBMODULES = names[names.index("submodules") + 1:]
+
+
+set_json_names(GitProject)
+set_json_names(GitSubmodule)
+
+
+def encode_json_value(value, indent=JSON_INDENT, level=0):
+    """
+    Encodes an attribute value of a project at the given nesting level, as json.dumps of the project would
+    """
+    if value is None:
+        return "null"
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    encoded = json.dumps(value, indent=indent, sort_keys=True, default=lambda o: o.__dict__)
+    return encoded.replace("\n", "\n" + " " * (indent * level))  # line breaks in strings are escaped
+
+
+def project_from_json_object(data):
+    # json objects are decoded inner first, so the submodules of a project are already built
+    if "submodules" not in data:
+        return data
+    return (GitSubmodule if "path" in data else GitProject)(**data)
+
+
+def run_git(cmd, console=False, cwd=None, log_file=None, check_output=False, timeout_sec=20, cache=None,
+            cache_files=()):
+    """
+    Runs a git command, its output (with the cwd and command header) is appended to log_file when given
+    :param cache: memoize the result of a read-only command (see execute.run)
+    :param cache_files: files the result depends on (see execute.run)
+    """
+    result = run(cmd, console=console, timeout_sec=timeout_sec, cwd=cwd, cache=cache, cache_files=cache_files)
+    if log_file is not None:
+        write_log(log_file, result.get_output().rstrip("\n"), console=False)
+    if check_output and result.return_code != 0 and result.exception is not None:
+        raise result.exception
     return result
 
 
-def get_head_hash(cwd=None):
+def read_git(cwd, query, *args):
+    """
+    Answers a read-only query in-process with GitReader
+    :param cwd: the working directory of the git repo
+    :param query: the GitReader method name
+    :return: the answer, None if the reader is disabled or can't answer (the caller should ask git instead)
+    """
+    if not USE_GIT_READER:
+        return None
+    try:
+        return getattr(GitReader(cwd), query)(*args)
+    except (GitReaderUnsupported, IOError, OSError, ValueError, zlib.error):
+        return None
+
+
+def get_head_hash(cwd=None, session=None):
     """
     Executes a command to get the hash of head (last commit in local repo)
     :param cwd the working directory of the git repo
+    :param session: an optional GitSession of the repo to ask instead of starting git
     :return: the last commit hash
     """
+    head_hash = read_git(cwd, "head_hash")
+    if head_hash is None and session is not None:
+        head_hash = session.commit_hash("HEAD")
+    if head_hash is not None:
+        return head_hash
     return str(run_git("git log --format=\"%H\" -n 1", cwd=cwd).get_output_lines()[-1]).replace("\"", "")
 
 
-def get_tag_hash(tag, cwd=None):
+def get_tag_hash(tag, cwd=None, session=None):
     """
     Executes a command that gets the given tag hash
     :param tag: the tag we want to get the hash for
     :param cwd the working directory of the git repo
+    :param session: an optional GitSession of the repo to ask instead of starting git
     :return: the hash of the given tag
     """
     if tag is not None:
+        tag_hash = read_git(cwd, "commit_hash", tag)
+        if tag_hash is None and session is not None:
+            tag_hash = session.commit_hash(tag)
+        if tag_hash is not None:
+            return tag_hash
         return run_git("git rev-list {} --max-count=1 --".format(tag), cwd=cwd).get_output_lines()[-1]
     else:
         return tag
@@ -71,6 +218,9 @@ def get_project_url(cwd):
     :param cwd the working directory of the git repo
     :return: the url of the project
     """
+    url = read_git(cwd, "remote_url")
+    if url is not None:
+        return url
     return run_git("git config remote.origin.url", cwd=cwd).get_output_lines()[-1]
 
 
@@ -89,16 +239,34 @@ def get_project_full_name(project_url):
     return project_name
 
 
-def get_tag_date(cwd, tag):
+def get_tag_date(cwd, tag, session=None):
     """
     Gets the given tag date
     :param cwd: the git project directory
     :param tag: the requested tag to get date for
+    :param session: an optional GitSession of the repo to ask instead of starting git
     :return: the date as str
     """
+    if session is not None:
+        tag_date = session.commit_date(tag)
+        if tag_date is not None:
+            return tag_date
     return run_git('git log -1 --format=%ai {}'.format(tag), cwd=cwd).get_output_lines()[-1]
 
 
+def object_exists(cwd, rev, session=None):
+    """
+    Checks whether a revision names an object in the repo
+    :param cwd: the git project directory
+    :param rev: an object hash, ref name or any revision git understands
+    :param session: an optional GitSession of the repo to ask instead of starting git
+    :return: True if the object exists
+    """
+    if session is not None:
+        return session.exists(rev)
+    return run_git(["git", "cat-file", "-e", rev], cwd=cwd).return_code == 0
+
+
 def has_git_changes(cwd):
     """
     Runs git status in the given path
@@ -117,94 +285,175 @@ def get_last_tag(cwd=None):
     :return: the last annotated tag, None if couldn't find
     """
     last_tag = None
-    all_tags = run_git('git tag --list', cwd=cwd).get_output_lines()
-    if len(all_tags) > 0:
+    has_tags = read_git(cwd, "has_refs", "refs/tags")
+    if has_tags is None:
+        has_tags = len(run_git('git tag --list', cwd=cwd).get_output_lines(exclude_command=True,
+                                                                           exclude_cwd=True)) > 0
+    if has_tags:
         last_tag = run_git('git describe --abbrev=0', cwd=cwd).get_output_lines()[-1]
     return last_tag
 
 
-def get_branch(current_hash=None, last_tag=None, cwd=None):
+def get_branch(current_hash=None, last_tag=None, cwd=None, fast=True):
     """
     Gets the branch name of the current commit in the project directory
     :param current_hash: the hash of 'HEAD' in the current project
     :param last_tag: the last tag we found
     :param cwd: the git project directory
+    :param fast: resolve the branch with find_branch_refs instead of 'git branch -a --contains'
     :return: the branch name on which our project is set
     """
     result = None
 
     if current_hash is not None:
-        cmd_result = run_git('git branch -a --contains \"{}\"'.format(current_hash), cwd=cwd,
-                             timeout_sec=60)
-        result = cmd_result.get_output_lines(exclude_command=True, exclude_cwd=True)
-        only_branches = [str(b[str(b).rfind("/") + 1:]).replace("/", "").strip(" *") for b in result if b]
-        unique_branches = list(set(only_branches))
-        unique_branches = [b for b in unique_branches if "detached from" not in b]
-        if len(unique_branches) == 1:
-            return unique_branches[0]
-        elif last_tag is not None:
-            result = get_most_exact(unique_branches, last_tag)
-        else:
-            return unique_branches[0]
+        result = find_branch_refs(current_hash, cwd) if fast else None
+        if result is None:
+            cmd_result = run_git('git branch -a --contains \"{}\"'.format(current_hash), cwd=cwd,
+                                 timeout_sec=60)
+            result = cmd_result.get_output_lines(exclude_command=True, exclude_cwd=True)
+        result = select_branch(result, last_tag)
 
     return result
 
 
-def resolve_tag_on_remote(cwd, log_file, fix=False):
+def find_branch_refs(commit, cwd, refs=None):
+    """
+    Finds the branches to pick the branch of a commit from, without walking the history of every branch:
+    the checked out branch if its tip is the commit, else the branches whose tip is the commit,
+    else the branches that contain it. Containment is checked once per distinct branch tip
+    ('git for-each-ref --contains' on one ref of each tip), not once per branch.
+    :param commit: the commit hash
+    :param cwd: the git project directory
+    :param refs: the (ref name, hash) tuples of the branches, listed if not given
+    :return: a list of branch refs
+    """
+    if refs is None:
+        refs = read_git(cwd, "list_refs", BRANCH_NAMESPACES)
+        if refs is None:
+            refs = get_refs(cwd, BRANCH_NAMESPACES)
+
+    tips = [ref_name for ref_name, ref_hash in refs if ref_hash == commit]
+    if tips:
+        head_ref = get_symbolic_head(cwd)
+        return [head_ref] if head_ref in tips else tips
+
+    tip_refs = {}
+    for ref_name, ref_hash in refs:
+        tip_refs.setdefault(ref_hash, ref_name)
+    candidates = sorted(tip_refs.values())
+    containing = set()
+    for chunk in chunk_arguments(candidates, CONTAINS_REFS_CHARS_PER_CALL):
+        containing.update(ref_hash for _, ref_hash in get_contained_refs(commit, cwd, chunk))
+    return [ref_name for ref_name, ref_hash in refs if ref_hash in containing]
+
+
+def chunk_arguments(args, max_chars):
+    """
+    Splits command arguments into chunks that fit a command line
+    :param args: the arguments
+    :param max_chars: the maximal length of a chunk, counting a separating space per argument
+    :return: a generator of argument lists, an argument longer than max_chars is a chunk of its own
+    """
+    chunk = []
+    chars = 0
+    for arg in args:
+        if chunk and chars + len(arg) + 1 > max_chars:
+            yield chunk
+            chunk = []
+            chars = 0
+        chunk.append(arg)
+        chars += len(arg) + 1
+    if chunk:
+        yield chunk
+
+
+def get_symbolic_head(cwd):
+    """
+    :param cwd: the git project directory
+    :return: the ref HEAD points at (e.g. refs/heads/master), None if HEAD is detached
+    """
+    head_ref = read_git(cwd, "head_ref")
+    if head_ref is None:
+        head_ref = run_git(["git", "rev-parse", "--symbolic-full-name", "HEAD"], cwd=cwd).get_output_lines()[-1]
+    return None if head_ref == "HEAD" else head_ref
+
+
+def select_branch(branches, last_tag=None):
+    """
+    Picks the branch name out of branches that contain a commit
+    :param branches: branch names or refs (e.g. 'remotes/origin/master', 'refs/heads/master')
+    :param last_tag: the last tag we found, used to pick between several branches
+    :return: the branch short name, None if there are no branches
+    """
+    only_branches = [str(b[str(b).rfind("/") + 1:]).replace("/", "").strip(" *") for b in branches if b]
+    unique_branches = sorted(set(only_branches))
+    unique_branches = [b for b in unique_branches if "detached from" not in b and not b.startswith("(")]
+    if len(unique_branches) == 0:
+        return None
+    elif len(unique_branches) == 1 or last_tag is None:
+        return unique_branches[0]
+    else:
+        return get_most_exact(unique_branches, last_tag)
+
+
+def get_remote_tag_index(cwd, pattern=None, remote="origin", delimiter="_"):
+    """
+    Lists the tags of a remote into a TagIndex with a single 'git ls-remote'
+    :param cwd: the working directory of the git project
+    :param pattern: an optional ls-remote pattern of the tags to list (e.g. 'release*')
+    :param remote: the remote name or url
+    :param delimiter: the delimiter the tags have from their counter
+    :return: a TagIndex of the remote tags
+    """
+    cmd = ["git", "ls-remote", "--tags", remote]
+    if pattern is not None:
+        cmd.append(pattern)
+    result = run_git(cmd, cwd=cwd)
+    return TagIndex.from_ls_remote(result.get_output_lines(exclude_command=True, exclude_cwd=True), delimiter)
+
+
+def resolve_tag_on_remote(cwd, log_file, fix=False, tag_index=None):
     """
     Makes sure that the last tag is not present on git, if it does - delete it
     :param log_file: the log file to write to
     :param cwd: the working directory of the git project
     :param fix whether to fix the tag by removing local tag
+    :param tag_index: a TagIndex of the remote tags, to reuse one listing for several calls (listed if not given)
     :return:
     """
     local_tag = get_last_tag(cwd)
     if fix:
-        i_tag, i_counter = local_tag.rsplit("_", 1)
-        remote_tags_result = run_git("git ls-remote --tags origin --pattern {}*".format(i_tag), cwd=cwd)
-        output_lines = remote_tags_result.get_output_lines()
-
-        namespace = "refs/tags/"
-        remote_tags = []
-        for line in output_lines:
-            tag_end_index = line.rfind("^{}")
-            if tag_end_index == -1:
-                tag_end_index = len(line)
-            result = line[line.rfind(namespace) + len(namespace):tag_end_index]
-            if result not in remote_tags:
-                remote_tags.append(result)
-
-        local_tag_index = index_of(remote_tags, local_tag)
-        if local_tag_index == -1:
+        if tag_index is None:
+            i_tag, i_counter = local_tag.rsplit("_", 1)
+            tag_index = get_remote_tag_index(cwd, "{}*".format(i_tag))
+
+        if local_tag not in tag_index:
             write_log(log_file, "Deleting local tag called {} ({})since its not on remote".format(local_tag,
                                                                                                   get_tag_hash(
                                                                                                       local_tag, cwd)))
             run_git("git tag -d {}".format(local_tag), cwd=cwd)
         else:
-            if local_tag_index < (len(remote_tags) - 1):
-                local_tag_body, local_tag_counter = local_tag.rsplit("_", 1)
-                local_tag_counter = int(local_tag_counter)
-                for idx in range(local_tag_index, len(remote_tags)):
-                    i_tag, i_counter = remote_tags[idx].rsplit("_", 1)
-                    i_counter, parsed = try_parse_int(i_counter)
-                    if parsed and local_tag_body == i_tag and local_tag_counter < i_counter:
-                        local_tag = remote_tags[idx]
+            local_tag = tag_index.newer_than(local_tag) or local_tag
 
     return local_tag
 
 
-def get_next_tag(current_tag, delimiter='_'):
+def get_next_tag(current_tag, delimiter='_', tag_index=None):
     """
     Generates the next tag based on the current tag.
     takes last part from split by delimiter and increments it by 1, then re-assemble
     :param current_tag: the current tag of the repository
     :param delimiter: the delimiter the tag has from the counter
+    :param tag_index: an optional TagIndex of existing tags, the next tag is then also newer than all of them
     :return:
     """
     next_tag = None
     if current_tag is not None:
         tag_body, tag_counter = current_tag.rsplit(delimiter, 1)
-        tag_counter = int(tag_counter) + 1
+        tag_counter = int(tag_counter)
+        if tag_index is not None:
+            tag_counter = max(tag_counter, tag_index.latest_counter(tag_body) or 0)
+        tag_counter += 1
         tag_counter_len = 3 if len(str(tag_counter)) < 3 else len(str(tag_counter))
         next_tag = "{}{}{}".format(tag_body, delimiter,
                                    '{number:0{width}d}'.format(number=tag_counter, width=tag_counter_len))
@@ -221,66 +470,210 @@ def get_submodules_from_gitmodules(cwd):
     Fills submodules info from .gitmodules file.
     must have full_path to keep processing submodule data
     :param cwd: the directory of the parent project
-    :return: a list of GitSubmodule
+    :return: a list of GitSubmodule, modules without a path are skipped (git ignores them too)
     """
-    git_modules_path = "{}{}{}".format(cwd.rstrip(os.path.sep), os.path.sep, ".gitmodules")
+    try:
+        config = read_config(os.path.join(cwd, ".gitmodules"))
+    except GitConfigError as e:
+        raise GitConfigError("{} in {}".format(e, os.path.join(cwd, ".gitmodules")))
     submodules = []
-    if os.path.exists(git_modules_path) and os.path.isfile(git_modules_path):
-        with open(git_modules_path, 'r') as git_modules:
-            can_read = False
-            submodule = None
-            for line in git_modules:
-                if "submodule" in line:
-                    can_read = not line.strip().startswith("#")
-                    if can_read:
-                        if submodule is not None:
-                            submodules.append(submodule)
-
-                        submodule = GitSubmodule()
-                        name_match = re.match('.*\"(.*)\".*', line, re.IGNORECASE)
-                        if name_match is not None:
-                            submodule.name = name_match.group(1).strip()
-                elif can_read:
-                    path_match = re.match('.*path.*=(.*)', line, re.IGNORECASE)
-                    if path_match is not None:
-                        submodule.path = path_match.group(1).strip()
-                        submodule.full_path = os.path.join(cwd, fix_path(submodule.path))
-                    else:
-                        url_match = re.match('.*url.*=(.*)', line, re.IGNORECASE)
-                        if url_match is not None:
-                            submodule.relative_url = url_match.group(1).strip()
-
-            if submodule is not None:
-                if len(submodules) == 0 or submodules[-1] != submodule:
-                    submodules.append(submodule)
-
+    for name, values in config.get_subsections("submodule").items():
+        path = values.get("path")
+        if not isinstance(path, str) or not path:
+            continue
+        submodules.append(GitSubmodule(name=name, path=path, full_path=os.path.join(cwd, fix_path(path)),
+                                       relative_url=values.get("url"), tracking_branch=values.get("branch"),
+                                       update=values.get("update")))
     return submodules
 
 
-def collect_git_info(git_project, parent_project=None):
+def find_submodule_tree(git_project):
+    """
+    Finds the whole nested submodules tree of a project in one breadth first pass over the .gitmodules files,
+    no git process is started. The submodules of every project in the tree are set.
+    :param git_project: the main GitProject, must have full_path
+    :return: a list of (project, parent project) tuples in breadth first order (parents come before their
+             submodules), the main project is first with a None parent
+    """
+    tree = [(git_project, None)]
+    for project, _ in tree:  # the list grows while it is iterated
+        project.submodules = get_submodules_from_gitmodules(project.full_path)
+        tree.extend((module, project) for module in project.submodules)
+    return tree
+
+
+def parse_describe(output):
+    """
+    Parses the output of 'git describe --long --always --abbrev=40'
+    :param output: the describe output line
+    :return: a tuple of (last tag, distance of HEAD from it, HEAD hash), tag and distance are None without a tag
+    """
+    describe_match = DESCRIBE_PATTERN.match(output)
+    if describe_match is not None:
+        return describe_match.group(1), int(describe_match.group(2)), describe_match.group(3)
+    elif HASH_PATTERN.match(output) is not None:
+        return None, None, output
+    return None, None, None
+
+
+def get_refs(cwd, patterns):
+    """
+    Lists refs with their targets in one git call
+    :param cwd: the git project directory
+    :param patterns: ref patterns to list (e.g. refs/heads)
+    :return: a list of (ref name, commit hash) tuples, annotated tags are peeled and symbolic refs are skipped
+    """
+    result = run_git(["git", "for-each-ref", "--format=%(objectname)%09%(*objectname)%09%(symref)%09%(refname)"] +
+                     list(patterns), cwd=cwd)
+    refs = []
+    for line in result.get_output_lines(exclude_command=True, exclude_cwd=True):
+        parts = line.split("\t")
+        if len(parts) != 4 or parts[2]:
+            continue
+        object_hash, peeled_hash, _, ref_name = parts
+        refs.append((ref_name, peeled_hash or object_hash))
+    return refs
+
+
+def get_contained_refs(commit, cwd, patterns=None):
+    """
+    Gets the branches (local and remote) containing the given commit, same as 'git branch -a --contains'
+    :param commit: the commit to look for
+    :param cwd: the git project directory
+    :param patterns: ref patterns to check (all branches by default)
+    :return: a list of (ref name, hash) tuples
+    """
+    result = run_git(["git", "for-each-ref", "--format=%(objectname)%09%(symref)%09%(refname)", "--contains",
+                      commit] + list(patterns or BRANCH_NAMESPACES), cwd=cwd, timeout_sec=60)
+    refs = [line.split("\t") for line in result.get_output_lines(exclude_command=True, exclude_cwd=True)]
+    return [(ref[2], ref[0]) for ref in refs if len(ref) == 3 and not ref[1]]
+
+
+def collect_project_metadata(git_project):
+    """
+    Fills the url, head hash, last tag, tag hash and branch of a project using batched git calls:
+    'git config' for the url, 'git describe' for HEAD and its last tag and 'git for-each-ref' for the tag
+    hash and the branch tips. The branch is resolved by find_branch_refs.
+    The url, tag hash and branch tips are read from the git directory when GitReader can.
+    :param git_project: the GitProject to fill, must have full_path
+    """
+    cwd = git_project.full_path
+    git_project.url = get_project_url(cwd=cwd)
+    describe = run_git(["git", "describe", "--long", "--always", "--abbrev=40"], cwd=cwd)
+    last_tag, _, head_hash = parse_describe(describe.get_output_lines()[-1])
+    git_project.head_hash = head_hash
+    git_project.last_tag = last_tag
+    git_project.tag_hash = None
+    git_project.branch = None
+    if head_hash is None:
+        return
+
+    refs = read_git(cwd, "list_refs", BRANCH_NAMESPACES)
+    if refs is not None:
+        git_project.tag_hash = get_tag_hash(last_tag, cwd)
+    else:
+        patterns = list(BRANCH_NAMESPACES)
+        if last_tag is not None:
+            patterns.append("refs/tags/{}".format(last_tag))
+        refs = get_refs(cwd, patterns)
+    branch_refs = []
+    for ref_name, commit in refs:
+        if ref_name.startswith("refs/tags/"):
+            git_project.tag_hash = commit
+        else:
+            branch_refs.append((ref_name, commit))
+    git_project.branch = select_branch(find_branch_refs(head_hash, cwd, branch_refs))
+
+
+def fill_project_info(git_project, batched=True, cache=None):
+    """
+    Fills the git info of a single project (url, hashes, tag and branch), without going into its submodules
+    :param git_project: the GitProject to fill, must have full_path
+    :param batched: use the batched git calls of collect_project_metadata
+    :param cache: a GitInfoCache to take the project info from, when its refs did not change
+    """
+    fingerprint = get_fingerprint(git_project.full_path) if cache is not None else None
+    if cache is None or not cache.get(git_project, fingerprint):
+        if batched:
+            collect_project_metadata(git_project)
+        else:
+            git_project.url = get_project_url(cwd=git_project.full_path)
+            git_project.head_hash = get_head_hash(cwd=git_project.full_path)
+            git_project.last_tag = get_last_tag(cwd=git_project.full_path)
+            git_project.tag_hash = get_tag_hash(git_project.last_tag, git_project.full_path)
+            git_project.branch = get_branch(git_project.head_hash, cwd=git_project.full_path)
+        if cache is not None:
+            cache.put(git_project, fingerprint)
+
+
+def set_project_identity(git_project, parent_project=None):
+    """
+    Names a filled project, its id is built from the id of its parent so the parent must be named first
+    """
+    git_project.full_name = get_project_full_name(git_project.url)
+    git_project.id = "{}{}".format("{}/".format(parent_project.id) if parent_project is not None else "",
+                                   git_project.full_name)
+    git_project.parent = None if parent_project is None else parent_project.full_name
+
+
+def collect_project_info(git_project, parent_project=None, batched=True, cache=None):
+    """
+    Collects the info of a single project, without going into its submodules
+    :param git_project: the GitProject to fill, must have full_path
+    :param parent_project: the project that contains git_project as a submodule (None for the main project)
+    :param batched: use the batched git calls of collect_project_metadata
+    :param cache: a GitInfoCache to take the project info from, when its refs did not change
+    :return: the submodules of the project (not collected yet)
+    """
+    fill_project_info(git_project, batched=batched, cache=cache)
+    set_project_identity(git_project, parent_project)
+    return get_submodules_from_gitmodules(git_project.full_path)
+
+
+def collect_git_info(git_project, parent_project=None, batched=True, cache=None):
     if isinstance(git_project, GitProject):
-        git_project.url = get_project_url(cwd=git_project.full_path)
-        git_project.head_hash = get_head_hash(cwd=git_project.full_path)
-        git_project.full_name = get_project_full_name(git_project.url)
-        git_project.last_tag = get_last_tag(cwd=git_project.full_path)
-        git_project.tag_hash = get_tag_hash(git_project.last_tag, git_project.full_path)
-        git_project.branch = get_branch(git_project.head_hash, cwd=git_project.full_path)
-        git_project.id = "{}{}".format("{}/".format(parent_project.id) if parent_project is not None else "",
-                                       git_project.full_name)
-        git_project.parent = None if parent_project is None else parent_project.full_name
-        submodules = get_submodules_from_gitmodules(git_project.full_path)
+        submodules = collect_project_info(git_project, parent_project, batched=batched, cache=cache)
         for module in submodules:
-            collect_git_info(module, git_project)
+            collect_git_info(module, git_project, batched=batched, cache=cache)
         git_project.submodules = submodules
 
 
-def get_info(cwd):
+def collect_git_info_concurrently(git_project, max_workers, batched=True, cache=None):
+    """
+    Collects the info of a project and its submodules tree. The tree is found first (find_submodule_tree), then
+    all its projects are collected concurrently and named in breadth first order once their info is in.
+    :param git_project: the main GitProject, must have full_path
+    :param max_workers: maximal number of projects collected at the same time
+    :param batched: use the batched git calls of collect_project_metadata
+    :param cache: an optional GitInfoCache
+    """
+    tree = find_submodule_tree(git_project)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(lambda item: fill_project_info(item[0], batched, cache), tree))
+    for project, parent_project in tree:
+        set_project_identity(project, parent_project)
+
+
+def get_info(cwd, batched=True, max_workers=1, cache=None):
+    """
+    Collects the git info of a project and all its submodules
+    :param cwd: the project directory (current directory if None)
+    :param batched: collect each project with the batched git calls of collect_project_metadata
+    :param max_workers: number of submodules collected concurrently, 1 collects them one by one
+    :param cache: a GitInfoCache, only projects whose refs changed since they were cached are collected
+    :return: the GitProject
+    """
     if cwd is None:
         # if cwd is not given, assume the caller is at the project directory
         cwd = os.path.abspath(os.getcwd())
     project = GitProject()
     project.full_path = cwd
-    collect_git_info(project, None)
+    if max_workers > 1:
+        collect_git_info_concurrently(project, max_workers, batched=batched, cache=cache)
+    else:
+        collect_git_info(project, None, batched=batched, cache=cache)
+    if cache is not None:
+        cache.save()
     return project
 
 
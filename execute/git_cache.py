@@ -0,0 +1,123 @@
+"""
+A persistent cache of the git info collected per project (the main project and each submodule).
+An entry is valid as long as the project fingerprint did not change, the fingerprint is built from
+HEAD and the loose refs (their content), packed-refs, the git config and .gitmodules (their stats),
+no git process is started.
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from execute.exceptions import GitReaderUnsupported
+from execute.git_reader import GitReader, read_file, stat_key
+from execute.utils import create_dir_for_file
+
+CACHED_FIELDS = ["url", "head_hash", "last_tag", "tag_hash", "branch"]
+
+
+def get_fingerprint(cwd):
+    """
+    Builds a fingerprint of the state of a project refs
+    :param cwd: the project working tree
+    :return: the fingerprint, None if the git directory can't be read
+    """
+    try:
+        reader = GitReader(cwd)
+    except (GitReaderUnsupported, IOError, OSError):
+        return None
+    digest = hashlib.sha1()
+    digest.update(os.path.abspath(cwd).encode("utf-8"))
+    digest.update((read_file(os.path.join(reader.git_dir, "HEAD")) or "").encode("utf-8"))
+    for path in (os.path.join(reader.common_dir, "packed-refs"), os.path.join(reader.common_dir, "config"),
+                 os.path.join(cwd, ".gitmodules")):
+        digest.update("{}={}\n".format(path, stat_key(path)).encode("utf-8"))
+    refs_dir = os.path.join(reader.common_dir, "refs")
+    for root, dirs, files in os.walk(refs_dir):
+        dirs.sort()
+        for file_name in sorted(files):
+            path = os.path.join(root, file_name)
+            # a loose ref is always the same size, so a ref moved within one mtime tick keeps its stats
+            digest.update("{}={}\n".format(path, read_file(path)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class GitInfoCache(object):
+    """
+    Keeps the collected info of projects in a json file, keyed by the project path and its fingerprint.
+    At most max_entries projects are kept, the least recently used are evicted first.
+    """
+
+    def __init__(self, path, max_entries=1000):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = None
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        if self.entries is None:
+            entries = OrderedDict()
+            if os.path.isfile(self.path):
+                try:
+                    with open(self.path, "r") as cache_file:
+                        entries = OrderedDict(json.load(cache_file, object_pairs_hook=OrderedDict))
+                except ValueError:
+                    pass
+            self.entries = entries
+        return self.entries
+
+    def get(self, git_project, fingerprint):
+        """
+        Fills the project with its cached info
+        :return: True if the project was filled, False if it has to be collected
+        """
+        with self.lock:
+            entries = self.load()
+            entry = entries.get(git_project.full_path)
+            if fingerprint is None or entry is None or entry["fingerprint"] != fingerprint:
+                self.misses += 1
+                return False
+            entries.move_to_end(git_project.full_path)
+            self.dirty = True
+            self.hits += 1
+        for field in CACHED_FIELDS:
+            setattr(git_project, field, entry["info"].get(field))
+        return True
+
+    def put(self, git_project, fingerprint):
+        """
+        Stores the collected info of the project
+        """
+        if fingerprint is None:
+            return
+        with self.lock:
+            entries = self.load()
+            entries.pop(git_project.full_path, None)
+            entries[git_project.full_path] = {"fingerprint": fingerprint,
+                                              "info": dict((f, getattr(git_project, f)) for f in CACHED_FIELDS)}
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self.dirty = True
+
+    def save(self):
+        """
+        Writes the cache file (if anything changed)
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+            create_dir_for_file(self.path)
+            temp_path = "{}.{}.tmp".format(self.path, os.getpid())
+            with open(temp_path, "w") as cache_file:
+                json.dump(self.entries, cache_file)
+            os.replace(temp_path, self.path)
+            self.dirty = False
+
+    def clear(self):
+        with self.lock:
+            self.entries = OrderedDict()
+            self.dirty = True
@@ -0,0 +1,195 @@
+"""
+A parser of the git config file format, shared by the .gitmodules reader and GitReader (.git/config).
+It follows git's syntax: [section] and [section "subsection"] headers, the deprecated [section.subsection]
+form, quoted values with escapes, line continuations, '#'/';' comments and keys without a value (true).
+"""
+import os
+import re
+
+from execute.exceptions import GitConfigError
+
+SECTION_PATTERN = re.compile(r'^\[\s*([A-Za-z0-9.-]+)\s*(?:"((?:[^"\\]|\\.)*)"\s*)?\]')
+KEY_PATTERN = re.compile(r'^([A-Za-z][A-Za-z0-9-]*)\s*(=?)')
+SUBSECTION_ESCAPE = re.compile(r'\\(.)')
+VALUE_ESCAPES = {"n": "\n", "t": "\t", "b": "\b", "\\": "\\", '"': '"'}
+MAX_INCLUDE_DEPTH = 10
+
+
+def parse_value(text, lines):
+    """
+    Parses a value the way git does: unquoted white space is trimmed at the ends (and kept inside),
+    comments end the value, quotes are removed and a backslash at the end of a line continues the value on the
+    next line (taken from lines)
+    :param text: the rest of the line after '='
+    :param lines: the iterator of the following lines
+    :return: the value
+    """
+    value = []
+    pending_space = ""
+    quoted = False
+    i = 0
+    while True:
+        if i >= len(text):
+            if quoted:
+                raise GitConfigError("unterminated quote in value")
+            return "".join(value)
+        char = text[i]
+        i += 1
+        if char == "\n":
+            if quoted:
+                raise GitConfigError("unterminated quote in value")
+            return "".join(value)
+        if not quoted and char in "#;":
+            return "".join(value)
+        if not quoted and char.isspace():
+            if value:
+                pending_space += char
+            continue
+        if pending_space:
+            value.append(pending_space)
+            pending_space = ""
+        if char == '"':
+            quoted = not quoted
+        elif char == "\\":
+            if i >= len(text) or text[i] == "\n":
+                text = next(lines, "")  # a continuation line
+                i = 0
+                continue
+            escaped = VALUE_ESCAPES.get(text[i])
+            if escaped is None:
+                raise GitConfigError("bad escape \\{} in value".format(text[i]))
+            value.append(escaped)
+            i += 1
+        else:
+            value.append(char)
+
+
+def iter_config(lines):
+    """
+    Parses the lines of a git config file as they are read
+    :param lines: an iterable of lines (e.g. an open file)
+    :return: a generator of (section, subsection, key, value) entries in the file order, section and key are
+             lower case, subsection is None for entries of a plain section and value is None for keys without '='
+    """
+    lines = iter(lines)
+    section = None
+    subsection = None
+    for line in lines:
+        line = line.lstrip()
+        if not line or line[0] in "#;":
+            continue
+        if line[0] == "[":
+            section_match = SECTION_PATTERN.match(line)
+            if section_match is None:
+                raise GitConfigError("bad section header {}".format(line.strip()))
+            name, quoted = section_match.groups()
+            rest = line[section_match.end():].strip()
+            if quoted is not None:
+                section, subsection = name.lower(), SUBSECTION_ESCAPE.sub(r'\1', quoted)
+            elif "." in name:  # [section.subsection], the subsection is lower cased
+                section, subsection = name.lower().split(".", 1)
+            else:
+                section, subsection = name.lower(), None
+            if not rest or rest[0] in "#;":
+                continue
+            line = rest  # a key may follow the header on the same line
+        key_match = KEY_PATTERN.match(line)
+        if key_match is None or section is None:
+            raise GitConfigError("bad config line {}".format(line.strip()))
+        key = key_match.group(1).lower()
+        if key_match.group(2):
+            value = parse_value(line[key_match.end():], lines)
+        else:
+            rest = line[key_match.end():].strip()
+            if rest and rest[0] not in "#;":
+                raise GitConfigError("bad config line {}".format(line.strip()))
+            value = None
+        yield section, subsection, key, value
+
+
+class GitConfig(object):
+    """
+    The entries of a git config file. Names are 'section.key' or 'section.subsection.key' (as 'git config' names
+    them), a key that appears more than once keeps all its values and the last one wins.
+    """
+
+    def __init__(self, entries=()):
+        self.entries = []
+        self.values = {}
+        self.subsections = {}
+        for entry in entries:
+            self.add(*entry)
+
+    def add(self, section, subsection, key, value):
+        self.entries.append((section, subsection, key, value))
+        name = "{}.{}".format(section, key) if subsection is None else "{}.{}.{}".format(section, subsection, key)
+        self.values.setdefault(name, []).append(value)
+        if subsection is not None:
+            subsections = self.subsections.setdefault(section, {})
+            subsections.setdefault(subsection, {})[key] = value
+
+    def get(self, name, default=None):
+        """
+        :param name: the full name, e.g. 'remote.origin.url' (section and key are case insensitive)
+        :return: the last value of the name, True for a key without a value
+        """
+        values = self.get_all(name)
+        if not values:
+            return default
+        return True if values[-1] is None else values[-1]
+
+    def get_all(self, name):
+        return self.values.get(normalize_name(name), [])
+
+    def get_subsections(self, section):
+        """
+        :return: an ordered dict-like mapping of subsection name to its {key: value} (last value wins),
+                 e.g. get_subsections("submodule") for the modules of a .gitmodules file
+        """
+        return self.subsections.get(section.lower(), {})
+
+    def __contains__(self, name):
+        return normalize_name(name) in self.values
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def normalize_name(name):
+    section, _, rest = name.partition(".")
+    subsection, _, key = rest.rpartition(".")
+    if not subsection:
+        return "{}.{}".format(section.lower(), key.lower())
+    return "{}.{}.{}".format(section.lower(), subsection, key.lower())
+
+
+def read_config(path, includes=False, config=None, depth=0):
+    """
+    Reads a git config file
+    :param path: the file path
+    :param includes: follow [include] path entries (relative to the including file), conditional includes
+                     ([includeIf]) can't be evaluated here and raise GitConfigError
+    :param config: a GitConfig to add the entries to
+    :return: the GitConfig, empty if the file does not exist
+    """
+    if config is None:
+        config = GitConfig()
+    if depth > MAX_INCLUDE_DEPTH:
+        raise GitConfigError("config includes are nested too deep at {}".format(path))
+    try:
+        config_file = open(path, "r")
+    except (IOError, OSError):
+        return config
+    with config_file:
+        for section, subsection, key, value in iter_config(config_file):
+            config.add(section, subsection, key, value)
+            if not includes:
+                continue
+            if section == "includeif":
+                raise GitConfigError("conditional includes are not supported ({})".format(path))
+            if section == "include" and key == "path" and value:
+                include_path = os.path.expanduser(value)
+                if not os.path.isabs(include_path):
+                    include_path = os.path.join(os.path.dirname(path), include_path)
+                read_config(include_path, includes=True, config=config, depth=depth + 1)
+    return config
@@ -0,0 +1,419 @@
+"""
+Answers read-only git queries (HEAD, refs, tags peeling and remote urls) by reading the git directory,
+without starting a git process. Anything it does not understand raises GitReaderUnsupported.
+"""
+import os
+import re
+import mmap
+import zlib
+import struct
+import threading
+from collections import OrderedDict
+
+from execute.exceptions import GitReaderUnsupported, GitConfigError
+from execute.git_config import read_config
+
+HASH_PATTERN = re.compile(r'^[0-9a-f]{40}$')
+REF_PREFIXES = ["refs/{}", "refs/tags/{}", "refs/heads/{}", "refs/remotes/{}", "refs/remotes/{}/HEAD"]
+PACK_TYPES = {1: "commit", 2: "tree", 3: "blob", 4: "tag"}
+MAX_REF_DEPTH = 5
+
+_cache_lock = threading.Lock()
+_packed_refs_cache = {}
+_pack_index_cache = OrderedDict()
+# each cached index keeps a map (and its file descriptor), the least recently used ones are closed
+MAX_PACK_INDEXES = 32
+
+
+def find_git_dir(cwd):
+    """
+    Finds the git directory of a working tree, following '.git' files (gitdir: ...) of submodules and worktrees
+    :param cwd: a directory inside the working tree
+    :return: the git directory path
+    """
+    path = os.path.abspath(cwd)
+    while True:
+        dot_git = os.path.join(path, ".git")
+        if os.path.isdir(dot_git):
+            return dot_git
+        if os.path.isfile(dot_git):
+            with open(dot_git, "r") as git_file:
+                content = git_file.read().strip()
+            if not content.startswith("gitdir:"):
+                raise GitReaderUnsupported("unknown .git file in {}".format(path))
+            return os.path.normpath(os.path.join(path, content[len("gitdir:"):].strip()))
+        parent = os.path.dirname(path)
+        if parent == path:
+            raise GitReaderUnsupported("{} is not in a git working tree".format(cwd))
+        path = parent
+
+
+def read_file(path):
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def stat_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime, st.st_size
+
+
+def parse_packed_refs(content):
+    """
+    Parses a packed-refs file
+    :return: a dict of ref name to a tuple of (hash, peeled hash), peeled hash is None for refs that
+             are known not to point at a tag object and False if unknown
+    """
+    traits = []
+    refs = {}
+    last_ref = None
+    for line in content.splitlines():
+        if line.startswith("#"):
+            if line.startswith("# pack-refs with:"):
+                traits = line[len("# pack-refs with:"):].split()
+            continue
+        if line.startswith("^"):
+            if last_ref is not None:
+                refs[last_ref] = (refs[last_ref][0], line[1:].strip())
+            continue
+        parts = line.split(" ", 1)
+        if len(parts) != 2:
+            continue
+        last_ref = parts[1].strip()
+        fully_peeled = "fully-peeled" in traits or ("peeled" in traits and last_ref.startswith("refs/tags/"))
+        refs[last_ref] = (parts[0], None if fully_peeled else False)
+    return refs
+
+
+class PackIndex(object):
+    """
+    Looks up object offsets in a version 2 pack index, the index is mapped until close() is called
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pack_path = path[:-len(".idx")] + ".pack"
+        with open(path, "rb") as idx:
+            self.data = mmap.mmap(idx.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:4] != b"\xfftOc" or struct.unpack(">I", self.data[4:8])[0] != 2:
+            raise GitReaderUnsupported("unsupported pack index {}".format(path))
+        self.fanout = struct.unpack(">256I", self.data[8:8 + 1024])
+        self.count = self.fanout[255]
+        self.hashes_offset = 8 + 1024
+        self.offsets_offset = self.hashes_offset + 24 * self.count
+        self.large_offsets_offset = self.offsets_offset + 4 * self.count
+
+    def find(self, binary_hash):
+        """
+        :return: the offset of the object in the pack, None if it is not in this pack
+        """
+        with self.lock:
+            if self.data is None:
+                raise GitReaderUnsupported("pack index {} was closed".format(self.path))
+            return self._find(binary_hash)
+
+    def _find(self, binary_hash):
+        first = bytearray(binary_hash)[0]
+        low = self.fanout[first - 1] if first > 0 else 0
+        high = self.fanout[first]
+        while low < high:
+            middle = (low + high) // 2
+            start = self.hashes_offset + 20 * middle
+            current = self.data[start:start + 20]
+            if current < binary_hash:
+                low = middle + 1
+            elif current > binary_hash:
+                high = middle
+            else:
+                offset = struct.unpack(">I", self.data[self.offsets_offset + 4 * middle:
+                                                      self.offsets_offset + 4 * middle + 4])[0]
+                if offset & 0x80000000:
+                    large = self.large_offsets_offset + 8 * (offset & 0x7fffffff)
+                    offset = struct.unpack(">Q", self.data[large:large + 8])[0]
+                return offset
+        return None
+
+    def close(self):
+        with self.lock:
+            data, self.data = self.data, None
+        if data is not None:
+            data.close()
+
+    def read_object(self, offset):
+        """
+        Reads a non deltified object from the pack
+        :return: a tuple of (type, content)
+        """
+        with open(self.pack_path, "rb") as pack:
+            pack.seek(offset)
+            header = bytearray(pack.read(16))
+            object_type = (header[0] >> 4) & 7
+            size = header[0] & 15
+            shift = 4
+            index = 0
+            while header[index] & 0x80:
+                index += 1
+                size |= (header[index] & 0x7f) << shift
+                shift += 7
+            if object_type not in PACK_TYPES:
+                raise GitReaderUnsupported("deltified object in {}".format(self.pack_path))
+            if object_type != 4:
+                return PACK_TYPES[object_type], None
+            pack.seek(offset + index + 1)
+            decompressor = zlib.decompressobj()
+            content = decompressor.decompress(pack.read(size + 1024), size)
+            return PACK_TYPES[object_type], content
+
+
+def get_pack_index(path):
+    key = stat_key(path)
+    with _cache_lock:
+        cached = _pack_index_cache.get(path)
+        if cached is not None and cached[0] == key:
+            _pack_index_cache.move_to_end(path)
+            return cached[1]
+    index = PackIndex(path)
+    evicted = []
+    with _cache_lock:
+        replaced = _pack_index_cache.pop(path, None)
+        if replaced is not None:
+            evicted.append(replaced[1])
+        _pack_index_cache[path] = (key, index)
+        while len(_pack_index_cache) > MAX_PACK_INDEXES:
+            evicted.append(_pack_index_cache.popitem(last=False)[1][1])
+    for old_index in evicted:
+        old_index.close()
+    return index
+
+
+def forget_pack_indexes(pack_dir, index_names):
+    """
+    Closes the cached indexes of a pack directory that are no longer in it (e.g. after 'git gc')
+    :param index_names: the .idx file names the directory has now
+    """
+    prefix = os.path.join(pack_dir, "")
+    with _cache_lock:
+        gone = [path for path in _pack_index_cache
+                if path.startswith(prefix) and os.path.basename(path) not in index_names]
+        evicted = [_pack_index_cache.pop(path)[1] for path in gone]
+    for index in evicted:
+        index.close()
+
+
+def close_pack_indexes():
+    """
+    Closes all the cached pack indexes
+    """
+    with _cache_lock:
+        evicted = [index for _, index in _pack_index_cache.values()]
+        _pack_index_cache.clear()
+    for index in evicted:
+        index.close()
+
+
+class GitReader(object):
+    """
+    Reads refs, objects and config of a git repository directly from its git directory
+    """
+
+    def __init__(self, cwd=None):
+        self.git_dir = find_git_dir(cwd if cwd is not None else os.getcwd())
+        common_dir = read_file(os.path.join(self.git_dir, "commondir"))
+        self.common_dir = self.git_dir if common_dir is None else \
+            os.path.normpath(os.path.join(self.git_dir, common_dir.strip()))
+        if os.path.exists(os.path.join(self.common_dir, "reftable")):
+            raise GitReaderUnsupported("reftable ref storage is not supported")
+        self._config = None
+
+    def packed_refs(self):
+        path = os.path.join(self.common_dir, "packed-refs")
+        key = stat_key(path)
+        if key is None:
+            return {}
+        with _cache_lock:
+            cached = _packed_refs_cache.get(path)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+        refs = parse_packed_refs(read_file(path) or "")
+        with _cache_lock:
+            _packed_refs_cache[path] = (key, refs)
+        return refs
+
+    def read_ref(self, name, depth=0):
+        """
+        Resolves a full ref name (e.g. HEAD, refs/heads/master), following symbolic refs
+        :return: the hash the ref points at, None if the ref does not exist
+        """
+        if depth > MAX_REF_DEPTH:
+            raise GitReaderUnsupported("too deep symbolic ref {}".format(name))
+        base_dir = self.git_dir if "/" not in name or name.startswith("refs/worktree/") else self.common_dir
+        content = read_file(os.path.join(base_dir, name))
+        if content is not None:
+            content = content.strip()
+            if content.startswith("ref:"):
+                return self.read_ref(content[len("ref:"):].strip(), depth + 1)
+            if HASH_PATTERN.match(content):
+                return content
+            raise GitReaderUnsupported("unknown ref content in {}".format(name))
+        packed = self.packed_refs().get(name)
+        return packed[0] if packed is not None else None
+
+    def head_hash(self):
+        """
+        :return: the commit hash of HEAD
+        """
+        head = self.read_ref("HEAD")
+        if head is None:
+            raise GitReaderUnsupported("HEAD does not point at a commit")
+        return head
+
+    def head_ref(self):
+        """
+        :return: the ref HEAD points at (e.g. refs/heads/master), 'HEAD' when detached
+                 (as 'git rev-parse --symbolic-full-name HEAD')
+        """
+        content = (read_file(os.path.join(self.git_dir, "HEAD")) or "").strip()
+        if content.startswith("ref:"):
+            return content[len("ref:"):].strip()
+        if HASH_PATTERN.match(content):
+            return "HEAD"
+        raise GitReaderUnsupported("unknown HEAD content")
+
+    def resolve(self, name):
+        """
+        Resolves a short ref name as git does (refs/<name>, refs/tags/<name>, refs/heads/<name>, ...)
+        :return: a tuple of (full ref name, hash)
+        """
+        if name == "HEAD":
+            return name, self.head_hash()
+        for prefix in REF_PREFIXES:
+            ref_name = prefix.format(name)
+            ref_hash = self.read_ref(ref_name)
+            if ref_hash is not None:
+                return ref_name, ref_hash
+        raise GitReaderUnsupported("can't resolve {}".format(name))
+
+    def list_refs(self, namespaces):
+        """
+        Lists the refs under the given namespaces (e.g. refs/heads), symbolic refs are skipped
+        :return: a list of (ref name, hash) tuples
+        """
+        refs = {}
+        for name, (ref_hash, _) in self.packed_refs().items():
+            if any(name.startswith(namespace + "/") for namespace in namespaces):
+                refs[name] = ref_hash
+        for namespace in namespaces:
+            namespace_dir = os.path.join(self.common_dir, namespace)
+            for root, _, files in os.walk(namespace_dir):
+                for file_name in files:
+                    path = os.path.join(root, file_name)
+                    name = os.path.relpath(path, self.common_dir).replace(os.path.sep, "/")
+                    content = (read_file(path) or "").strip()
+                    if HASH_PATTERN.match(content):
+                        refs[name] = content
+                    elif not content.startswith("ref:"):
+                        raise GitReaderUnsupported("unknown ref content in {}".format(name))
+                    else:
+                        refs.pop(name, None)
+        return sorted(refs.items())
+
+    def has_refs(self, namespace):
+        """
+        :return: True if there is at least one ref under the namespace (e.g. refs/tags)
+        """
+        for _, _, files in os.walk(os.path.join(self.common_dir, namespace)):
+            if files:
+                return True
+        return any(name.startswith(namespace + "/") for name in self.packed_refs())
+
+    def object_dirs(self):
+        objects_dir = os.path.join(self.common_dir, "objects")
+        dirs = [objects_dir]
+        alternates = read_file(os.path.join(objects_dir, "info", "alternates"))
+        if alternates is not None:
+            for line in alternates.splitlines():
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    dirs.append(os.path.normpath(os.path.join(objects_dir, line)))
+        return dirs
+
+    def read_object(self, object_hash):
+        """
+        Reads an object from the loose objects or the packs
+        :return: a tuple of (type, content), content is only read for tag objects
+        """
+        for objects_dir in self.object_dirs():
+            path = os.path.join(objects_dir, object_hash[:2], object_hash[2:])
+            if os.path.isfile(path):
+                with open(path, "rb") as loose:
+                    data = zlib.decompress(loose.read())
+                header, content = data.split(b"\0", 1)
+                object_type = header.split(b" ")[0].decode("ascii")
+                return object_type, content if object_type == "tag" else None
+
+            binary_hash = bytes(bytearray.fromhex(object_hash))
+            pack_dir = os.path.join(objects_dir, "pack")
+            if os.path.isdir(pack_dir):
+                index_names = sorted(name for name in os.listdir(pack_dir) if name.endswith(".idx"))
+                forget_pack_indexes(pack_dir, index_names)
+                for file_name in index_names:
+                    index = get_pack_index(os.path.join(pack_dir, file_name))
+                    offset = index.find(binary_hash)
+                    if offset is not None:
+                        return index.read_object(offset)
+        raise GitReaderUnsupported("object {} not found".format(object_hash))
+
+    def peel(self, object_hash):
+        """
+        Follows tag objects to the commit they point at
+        :return: the commit hash
+        """
+        for _ in range(MAX_REF_DEPTH):
+            object_type, content = self.read_object(object_hash)
+            if object_type == "commit":
+                return object_hash
+            if object_type != "tag":
+                raise GitReaderUnsupported("{} is a {}".format(object_hash, object_type))
+            first_line = content.split(b"\n", 1)[0].decode("ascii")
+            if not first_line.startswith("object "):
+                raise GitReaderUnsupported("bad tag object {}".format(object_hash))
+            object_hash = first_line[len("object "):].strip()
+        raise GitReaderUnsupported("too deep tag chain")
+
+    def commit_hash(self, name):
+        """
+        Resolves a ref name to the commit it points at (annotated tags are peeled), like 'git rev-list -1 <name>'
+        :return: the commit hash
+        """
+        ref_name, ref_hash = self.resolve(name)
+        packed = self.packed_refs().get(ref_name)
+        if packed is not None and packed[0] == ref_hash and packed[1] is not False:
+            return packed[1] or ref_hash
+        return self.peel(ref_hash)
+
+    def config(self):
+        """
+        :return: the GitConfig of the repo config file, includes are followed
+        """
+        if self._config is None:
+            try:
+                self._config = read_config(os.path.join(self.common_dir, "config"), includes=True)
+            except GitConfigError as e:
+                raise GitReaderUnsupported(str(e))
+        return self._config
+
+    def remote_url(self, remote="origin"):
+        """
+        :return: the url of the remote, as 'git config remote.<remote>.url'
+        """
+        url = self.config().get("remote.{}.url".format(remote))
+        if url is None:
+            raise GitReaderUnsupported("remote {} has no url".format(remote))
+        return url
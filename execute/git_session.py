@@ -0,0 +1,168 @@
+"""
+Answers repeated git object queries of a repo over long-lived 'git cat-file --batch-check' and
+'git cat-file --batch' processes, instead of starting a git process per query.
+"""
+import re
+import datetime
+import threading
+import subprocess
+
+from execute.scheduler import get_scheduler
+
+DEFAULT_TIMEOUT_SEC = 20
+PERSON_PATTERN = re.compile(br'^(?:author|committer) .* (\d+) ([+-])(\d\d)(\d\d)$')
+
+
+class BatchProcess(object):
+    """
+    A 'git cat-file' batch process, its queries are serialized by a lock
+    """
+
+    def __init__(self, cwd, mode):
+        self.cwd = cwd
+        self.mode = mode
+        self.process = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        if self.process is None or self.process.poll() is not None:
+            self.process = subprocess.Popen(["git", "cat-file", self.mode], stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=self.cwd)
+        return self.process
+
+    def query(self, rev, timeout_sec):
+        """
+        :param rev: anything 'git rev-parse' accepts (no white spaces)
+        :param timeout_sec: kill the process if it does not answer in time
+        :return: a tuple of (object hash, object type, content), content is None for --batch-check,
+                 None if the object is missing
+        """
+        with self.lock:
+            process = self.start()
+            timeout_call = get_scheduler().schedule(timeout_sec, process.kill)
+            try:
+                process.stdin.write(rev.encode("utf-8") + b"\n")
+                process.stdin.flush()
+                header = process.stdout.readline()
+                if not header:
+                    raise IOError("git cat-file {} exited".format(self.mode))
+                fields = header.split()
+                if len(fields) != 3:  # '<rev> missing' or '<rev> ambiguous'
+                    return None
+                content = None
+                if self.mode == "--batch":
+                    size = int(fields[2])
+                    content = process.stdout.read(size + 1)[:size]
+                    if len(content) != size:
+                        raise IOError("git cat-file {} output ended".format(self.mode))
+                return fields[0].decode("ascii"), fields[1].decode("ascii"), content
+            except (IOError, OSError, ValueError):
+                self.close()
+                raise
+            finally:
+                timeout_call.cancel()
+
+    def close(self):
+        process, self.process = self.process, None
+        if process is not None:
+            try:
+                process.stdin.close()
+            except (IOError, OSError):
+                pass
+            if process.poll() is None:
+                try:
+                    process.wait(timeout=1)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+            process.stdout.close()
+
+
+class GitSession(object):
+    """
+    A repo bound session that answers rev-parse, tag peeling, commit date and object existence queries over
+    long-lived 'git cat-file' processes (started on first use). The session may be shared between threads,
+    close it when done (or use it as a context manager).
+    The query methods return None when git can't answer (an unknown revision, or the batch process failed).
+    """
+
+    def __init__(self, cwd, timeout_sec=DEFAULT_TIMEOUT_SEC):
+        self.cwd = cwd
+        self.timeout_sec = timeout_sec
+        self.batch_check = BatchProcess(cwd, "--batch-check")
+        self.batch = BatchProcess(cwd, "--batch")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.batch_check.close()
+        self.batch.close()
+
+    def check(self, rev):
+        """
+        :return: a tuple of (object hash, object type), None if there is no such object
+        """
+        try:
+            answer = self.batch_check.query(rev, self.timeout_sec)
+        except (IOError, OSError, ValueError):
+            return None
+        return None if answer is None else answer[:2]
+
+    def read(self, rev):
+        """
+        :return: a tuple of (object hash, object type, content bytes), None if there is no such object
+        """
+        try:
+            return self.batch.query(rev, self.timeout_sec)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def rev_parse(self, rev):
+        """
+        :return: the object hash rev names, like 'git rev-parse <rev>'
+        """
+        answer = self.check(rev)
+        return None if answer is None else answer[0]
+
+    def commit_hash(self, rev):
+        """
+        :return: the commit rev points at, annotated tags are peeled (like 'git rev-list -1 <rev>')
+        """
+        return self.rev_parse("{}^{{commit}}".format(rev))
+
+    def exists(self, rev):
+        """
+        :return: True if rev names an object in the repo
+        """
+        return self.check(rev) is not None
+
+    def commit_date(self, rev):
+        """
+        :return: the author date of the commit rev points at, formatted as 'git log -1 --format=%ai <rev>'
+        """
+        answer = self.read("{}^{{commit}}".format(rev))
+        if answer is None:
+            return None
+        for line in answer[2].split(b"\n"):
+            if not line:  # the headers ended
+                break
+            if line.startswith(b"author "):
+                return format_git_date(line)
+        return None
+
+
+def format_git_date(person_line):
+    """
+    Formats the date of an author/committer line of a commit as git's '%ai' does, e.g. '2020-01-31 16:20:00 +0200'
+    """
+    match = PERSON_PATTERN.match(person_line)
+    if match is None:
+        return None
+    timestamp, sign, hours, minutes = match.groups()
+    offset = (int(hours) * 60 + int(minutes)) * 60 * (-1 if sign == b"-" else 1)
+    local = datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=int(timestamp) + offset)
+    return "{} {}{}{}".format(local.strftime("%Y-%m-%d %H:%M:%S"), sign.decode(), hours.decode(), minutes.decode())
@@ -0,0 +1,95 @@
+"""
+An index of counted tags (<body><delimiter><counter>, e.g. release_012) for resolving the latest tag of a body
+without scanning all the tags per lookup.
+"""
+import bisect
+
+from execute.utils import try_parse_int
+
+TAGS_NAMESPACE = "refs/tags/"
+PEELED_SUFFIX = "^{}"
+
+
+def split_tag(tag, delimiter="_"):
+    """
+    :return: a tuple of the tag body and its counter, None if the tag has no numeric counter
+    """
+    if delimiter not in tag:
+        return None
+    body, counter = tag.rsplit(delimiter, 1)
+    counter, parsed = try_parse_int(counter)
+    return (body, counter) if parsed else None
+
+
+def parse_ls_remote_tags(lines):
+    """
+    Gets the tag names out of 'git ls-remote --tags' output lines ('<hash>\\trefs/tags/<name>[^{}]'),
+    once per tag (the peeled line of an annotated tag is skipped)
+    """
+    for line in lines:
+        _, _, ref = line.partition("\t")
+        if ref.startswith(TAGS_NAMESPACE) and not ref.endswith(PEELED_SUFFIX):
+            yield ref[len(TAGS_NAMESPACE):]
+
+
+class TagIndex(object):
+    """
+    The tags of a repo grouped by body, with the counters of each body sorted, built in one pass.
+    Membership is O(1) and counter lookups of a body are O(log n), so one index can serve many lookups
+    (resolve_tag_on_remote, get_next_tag).
+    """
+
+    def __init__(self, tags=(), delimiter="_"):
+        self.delimiter = delimiter
+        self.tags = set()
+        self.counters = {}
+        self.names = {}
+        for tag in tags:
+            self.tags.add(tag)
+            split = split_tag(tag, delimiter)
+            if split is not None:
+                self.counters.setdefault(split[0], []).append(split[1])
+                self.names.setdefault(split, tag)
+        for body, counters in self.counters.items():
+            self.counters[body] = sorted(set(counters))
+
+    @classmethod
+    def from_ls_remote(cls, lines, delimiter="_"):
+        return cls(parse_ls_remote_tags(lines), delimiter)
+
+    def __contains__(self, tag):
+        return tag in self.tags
+
+    def __len__(self):
+        return len(self.tags)
+
+    def latest_counter(self, body):
+        """
+        :return: the highest counter of the body, None if it has no tags
+        """
+        counters = self.counters.get(body)
+        return counters[-1] if counters else None
+
+    def latest(self, body):
+        """
+        :return: the tag of the body with the highest counter, None if it has no tags
+        """
+        counter = self.latest_counter(body)
+        return None if counter is None else self.names[(body, counter)]
+
+    def has_counter(self, body, counter):
+        counters = self.counters.get(body, [])
+        index = bisect.bisect_left(counters, counter)
+        return index < len(counters) and counters[index] == counter
+
+    def newer_than(self, tag):
+        """
+        :return: the latest tag of the tag body if its counter is higher than the tag counter, None otherwise
+        """
+        split = split_tag(tag, self.delimiter)
+        if split is None:
+            return None
+        latest_counter = self.latest_counter(split[0])
+        if latest_counter is None or latest_counter <= split[1]:
+            return None
+        return self.names[(split[0], latest_counter)]
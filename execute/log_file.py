@@ -0,0 +1,165 @@
+import os
+import re
+import mmap
+import bisect
+from array import array
+
+ENCODING = "utf-8"
+LINE_BREAK = re.compile(b'\n')
+NON_SPACE = re.compile(b'\\S')
+
+
+class LogFile(object):
+    """
+    Read access to a (possibly huge) output file through mmap, so looking at its end or searching it
+    never loads the whole file into memory.
+    The offsets of the line starts are indexed once on first use, and only the part of the file
+    written since is indexed on later calls.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.map = None
+        self.size = 0
+        self.line_starts = array('Q', [0])
+        self.indexed = 0
+
+    def refresh(self):
+        """
+        Maps the file again if it grew since it was mapped
+        :return: the size of the file
+        """
+        size = os.path.getsize(self.path)
+        if size != self.size or (self.map is None and size > 0):
+            self.close_map()
+            if self.file is None:
+                self.file = open(self.path, "rb")
+            if size > 0:
+                self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.size = size
+            if size < self.indexed:  # the file was rewritten
+                self.line_starts = array('Q', [0])
+                self.indexed = 0
+        return self.size
+
+    def close_map(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def close(self):
+        self.close_map()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def decode(data):
+        return data.decode(ENCODING, "replace")
+
+    def tail(self, count, strip=True):
+        """
+        Gets the last lines of the file by scanning it backward from its end
+        :param count: the number of lines
+        :param strip: whether to ignore trailing white spaces of the file (as Execute.get_output does)
+        :return: a list of up to count lines
+        """
+        if self.refresh() == 0 or count <= 0:
+            return []
+        end = self.size
+        if strip:
+            while end > 0 and self.map[end - 1:end].isspace():
+                end -= 1
+        start = end
+        if self.map[end - 1:end] == b'\n':  # a line break at the end doesn't start another line
+            start -= 1
+        for _ in range(count):
+            start = self.map.rfind(b'\n', 0, start)
+            if start == -1:
+                break
+        start += 1
+        if strip and NON_SPACE.search(self.map, 0, start) is None:
+            # only white spaces before the wanted lines, which stripping the whole file would remove
+            start = 0
+        text = self.decode(self.map[start:end])
+        if strip and start == 0:
+            text = text.lstrip()
+        return text.splitlines()[-count:]
+
+    def index(self):
+        """
+        Indexes the line starts of the part of the file that was not indexed yet
+        :return: the number of lines in the file
+        """
+        self.refresh()
+        if self.indexed < self.size:
+            line_starts = self.line_starts
+            for match in LINE_BREAK.finditer(self.map, self.indexed):
+                line_starts.append(match.end())
+            self.indexed = self.size
+        return self.line_count()
+
+    def line_count(self):
+        # a line break at the end of the file doesn't start another line
+        if self.line_starts[-1] == self.size:
+            return len(self.line_starts) - 1
+        return len(self.line_starts)
+
+    def lines(self, start=0, stop=None):
+        """
+        Gets lines by their numbers (zero based) using the line index
+        :param start: the first line number
+        :param stop: the line number to stop before (the end of the file by default)
+        :return: a list of the lines, without their line breaks
+        """
+        count = self.index()
+        stop = count if stop is None else min(stop, count)
+        if start >= stop:
+            return []
+        end = self.line_starts[stop] if stop < len(self.line_starts) else self.size
+        return self.decode(self.map[self.line_starts[start]:end]).splitlines()
+
+    def line_number(self, offset):
+        """
+        :return: the number (zero based) of the line that contains the given byte offset
+        """
+        self.index()
+        return self.find_line(offset)
+
+    def find_line(self, offset):
+        return bisect.bisect_right(self.line_starts, offset) - 1
+
+    def grep(self, pattern, flags=0, max_count=None):
+        """
+        Searches the file forward for lines matching a regular expression, without splitting it into lines
+        :param pattern: a regular expression (str or bytes), matched against the bytes of the file
+        :param flags: re flags of the pattern (re.MULTILINE is always set, so ^ and $ match at line bounds)
+        :param max_count: stop after this number of matching lines
+        :return: a generator of (line number, line) tuples
+        """
+        if not isinstance(pattern, bytes):
+            pattern = pattern.encode(ENCODING)
+        regex = re.compile(pattern, flags | re.MULTILINE)
+        if self.index() == 0:
+            return
+        found = 0
+        position = 0
+        while position <= self.size and (max_count is None or found < max_count):
+            match = regex.search(self.map, position)
+            if match is None:
+                return
+            line_start = self.map.rfind(b'\n', 0, match.start()) + 1
+            line_end = self.map.find(b'\n', match.start())
+            if line_end == -1:
+                line_end = self.size
+            yield self.find_line(line_start), self.decode(self.map[line_start:line_end]).rstrip("\r")
+            found += 1
+            position = line_end + 1
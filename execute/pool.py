@@ -0,0 +1,249 @@
+import threading
+from collections import deque
+
+try:
+    from queue import Queue
+except ImportError:  # python 2
+    from Queue import Queue
+
+from execute import Execute
+from execute.capture import CAPTURE_FULL, DEFAULT_TAIL_BYTES
+from execute.pump import OutputPump, can_select_pipes
+from execute.scheduler import get_scheduler, KILL_SIGNAL
+from execute.stats import get_metrics
+
+REAP_INTERVAL_SEC = 0.05
+
+
+class PoolJob(object):
+    def __init__(self, execute, cmd, output_path=None, cwd=None, env=None, timeout_sec=7200):
+        self.execute = execute
+        self.cmd = cmd
+        self.output_path = output_path
+        self.cwd = cwd
+        self.env = env
+        self.timeout_sec = timeout_sec
+        self.fd = None
+        self.eof = False
+        self.timeout_call = None
+
+    def on_eof(self):
+        self.eof = True
+
+
+class ExecutePool(object):
+    """
+    Runs many commands concurrently, with at most max_workers of them alive at a time.
+    A single reaper thread reads the output of all running commands and collects the exited ones,
+    timeouts are enforced by the shared TimeoutScheduler, so no threads are started per command.
+    On platforms where pipes can't be multiplexed (windows) max_workers threads run the commands instead.
+    """
+
+    def __init__(self, max_workers=4, console=False, scheduler=None, capture=CAPTURE_FULL,
+                 max_bytes=DEFAULT_TAIL_BYTES, escalation=None, write_policy=None, process_group=False,
+                 fast_spawn=False):
+        self.max_workers = max_workers
+        self.console = console
+        self.capture = capture
+        self.max_bytes = max_bytes
+        self.escalation = escalation
+        self.write_policy = write_policy
+        self.process_group = process_group
+        self.fast_spawn = fast_spawn
+        self.scheduler = scheduler if scheduler is not None else get_scheduler()
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.running = []
+        self.completed = Queue()
+        self.submitted = 0
+        self.closed = False
+        self.threads = []
+        self.workers = 0
+        self.pump = OutputPump() if can_select_pipes() else None
+
+    def submit(self, cmd, output_path=None, cwd=None, env=None, timeout_sec=7200):
+        """
+        Queues a command, arguments are the same as execute.run
+        :return: the Execute object of the command (its results are valid once it is yielded by as_completed)
+        """
+        execute = Execute(console=self.console, capture=self.capture, max_bytes=self.max_bytes,
+                          escalation=self.escalation, write_policy=self.write_policy,
+                          process_group=self.process_group, fast_spawn=self.fast_spawn)
+        job = PoolJob(execute, cmd, output_path=output_path, cwd=cwd, env=env, timeout_sec=timeout_sec)
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("Can't submit to a closed pool")
+            self.pending.append(job)
+            self.submitted += 1
+            self._start_threads()
+        if self.pump is not None:
+            self.pump.wakeup()
+        return execute
+
+    def as_completed(self):
+        """
+        Yields the Execute results of the submitted commands in completion order
+        """
+        done = 0
+        while done < self.submitted:
+            yield self.completed.get()
+            done += 1
+
+    def close(self, cancel=False):
+        """
+        Waits for all submitted commands and releases the pool threads
+        :param cancel: drop the queued commands and kill the running ones instead of waiting for them
+        """
+        with self.lock:
+            self.closed = True
+            if cancel:
+                self.pending.clear()
+        if cancel:
+            self.kill_all()
+        if self.pump is not None:
+            self.pump.wakeup()
+        for thread in self.threads:
+            thread.join()
+        if self.pump is not None:
+            self.pump.close()
+
+    def kill_all(self, sig=KILL_SIGNAL):
+        """
+        Signals all the running commands of the pool in one pass (their whole process groups when the pool runs
+        them in process group mode), queued commands still start
+        :return: the number of commands signaled
+        """
+        with self.lock:
+            executes = [job.execute for job in self.running]
+        for execute in executes:
+            execute.send_signal(sig)
+        if self.pump is not None:
+            self.pump.wakeup()
+        return len(executes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close(cancel=exc_type is not None)
+
+    def _start_threads(self):
+        if self.pump is not None:
+            if not self.threads:
+                self.threads.append(self._new_thread(self._reap, "execute-pool-reaper"))
+        elif self.workers < self.max_workers:
+            # a worker exits once the queue is empty, so only the live ones are counted
+            self.threads = [thread for thread in self.threads if thread.is_alive()]
+            self.workers += 1
+            self.threads.append(self._new_thread(self._work, "execute-pool-worker"))
+
+    @staticmethod
+    def _new_thread(target, name):
+        thread = threading.Thread(target=target, name=name)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _work(self):
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self.workers -= 1
+                    return
+                job = self.pending.popleft()
+                self.running.append(job)
+            job.execute.execute(job.cmd, job.output_path, cwd=job.cwd, env=job.env, timeout_sec=job.timeout_sec)
+            with self.lock:
+                self.running.remove(job)
+            self.completed.put(job.execute)
+
+    def _reap(self):
+        while True:
+            self._start_pending()
+            with self.lock:
+                if self.closed and not self.running and not self.pending:
+                    return
+            self.pump.run_once(self._wait_timeout())
+            self._collect()
+
+    def _start_pending(self):
+        while True:
+            with self.lock:
+                if not self.pending or len(self.running) >= self.max_workers:
+                    return
+                job = self.pending.popleft()
+                self.running.append(job)
+
+            try:
+                process = job.execute.start(job.cmd, job.output_path, cwd=job.cwd, env=job.env)
+            except Exception as e:
+                print(e)
+                self._complete(job)
+                continue
+            job.fd = process.stdout.fileno()
+            self.pump.register(job.fd, job.execute.feed, job.on_eof)
+            job.timeout_call = self.scheduler.schedule(job.timeout_sec, self._on_timeout, job)
+
+    def _on_timeout(self, job):
+        job.execute.__kill_by_timeout__()
+        self.pump.wakeup()
+
+    def _wait_timeout(self):
+        # a process that closed its output may still be exiting, check it again shortly instead of blocking
+        for job in self.running:
+            if job.eof or job.execute.timed_out():
+                return REAP_INTERVAL_SEC
+        return None
+
+    def _collect(self):
+        for job in list(self.running):
+            if not job.eof and not job.execute.timed_out():
+                continue
+            if job.execute.poll_process() is None:
+                continue
+            if not job.eof:
+                # the command was killed but something it started still holds the output pipe
+                self.pump.drain(fds=[job.fd])
+                self.pump.unregister(job.fd)
+            self._complete(job)
+
+    def _complete(self, job):
+        if job.timeout_call is not None:
+            job.timeout_call.cancel()
+        if job.execute.start_time is not None:
+            job.execute.finish()
+            get_metrics().record(job.execute)
+        with self.lock:
+            self.running.remove(job)
+        self.completed.put(job.execute)
+
+
+def run_many(cmds, max_workers=4, console=False, capture=CAPTURE_FULL, max_bytes=DEFAULT_TAIL_BYTES,
+             escalation=None, write_policy=None, process_group=False, fast_spawn=False, **kwargs):
+    """
+    Runs commands concurrently over an ExecutePool
+    :param cmds: commands as accepted by run, or dicts of run arguments (cmd, output_path, cwd, env, timeout_sec)
+                 for per command settings
+    :param max_workers: maximal number of commands running at the same time
+    :param console: whether to print the commands output
+    :param capture: the output capture mode of the commands (see Execute)
+    :param max_bytes: size of the output kept by CAPTURE_TAIL
+    :param escalation: how timed out commands are stopped (see Execute)
+    :param write_policy: how the commands output is flushed and printed (see Execute)
+    :param process_group: run each command in its own process group (see Execute)
+    :param fast_spawn: start the commands with vfork or posix_spawn where possible (see Execute)
+    :param kwargs: run arguments used for all commands (overridden by a command dict)
+    :return: a generator of the Execute results in completion order
+    """
+    with ExecutePool(max_workers=max_workers, console=console, capture=capture, max_bytes=max_bytes,
+                     escalation=escalation, write_policy=write_policy, process_group=process_group,
+                     fast_spawn=fast_spawn) as pool:
+        for cmd in cmds:
+            job_kwargs = dict(kwargs)
+            if isinstance(cmd, dict):
+                job_kwargs.update(cmd)
+                pool.submit(**job_kwargs)
+            else:
+                pool.submit(cmd, **job_kwargs)
+        for execute in pool.as_completed():
+            yield execute
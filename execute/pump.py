@@ -0,0 +1,170 @@
+import os
+import threading
+
+try:
+    import selectors
+except ImportError:  # python 2 has no selectors module, fallback to blocking reads
+    selectors = None
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def can_select_pipes():
+    """
+    Checks whether pipes can be waited on with a selector (not supported for pipes on windows)
+    :return: True if the pump can multiplex pipes, False otherwise
+    """
+    return selectors is not None and os.name != 'nt'
+
+
+class OutputPump(object):
+    """
+    Reads process output pipes in large chunks and hands the raw bytes to a callback.
+    The pump sleeps until data arrives (or the pipe is closed) instead of polling the process,
+    a pipe is done once it reports EOF.
+    """
+
+    def __init__(self, chunk_size=READ_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.streams = {}
+        self.stopping = False
+        self.selector = None
+        self.lock = threading.Lock()
+        self.pending = []
+        self.wakeup_read = None
+        self.wakeup_write = None
+        if can_select_pipes():
+            self.selector = selectors.DefaultSelector()
+            self.wakeup_read, self.wakeup_write = os.pipe()
+            self.selector.register(self.wakeup_read, selectors.EVENT_READ)
+
+    def register(self, stream, on_data, on_eof=None):
+        """
+        Adds a stream to be read by the pump
+        :param stream: a file object (or file descriptor) to read from
+        :param on_data: a callable that gets each chunk of bytes read from the stream
+        :param on_eof: an optional callable that is called once the stream reached EOF
+        """
+        fd = stream if isinstance(stream, int) else stream.fileno()
+        self.streams[fd] = (on_data, on_eof)
+        if self.selector is not None:
+            self.selector.register(fd, selectors.EVENT_READ, (on_data, on_eof))
+
+    def register_threadsafe(self, stream, on_data, on_eof=None):
+        """
+        Same as register, but may be called from another thread while the pump is waiting
+        """
+        with self.lock:
+            self.pending.append((stream, on_data, on_eof))
+        self.wakeup()
+
+    def stop(self):
+        """
+        Asks the pump to stop waiting for data, whatever is already readable is still consumed.
+        Safe to call from another thread.
+        """
+        self.stopping = True
+        self.wakeup()
+
+    def wakeup(self):
+        """
+        Interrupts a pump that waits for data, safe to call from another thread
+        """
+        if self.wakeup_write is not None:
+            try:
+                os.write(self.wakeup_write, b'\0')
+            except OSError:
+                pass
+
+    def read_chunk(self, fd):
+        if fd not in self.streams:
+            return False
+        on_data, on_eof = self.streams[fd]
+        try:
+            chunk = os.read(fd, self.chunk_size)
+        except OSError:
+            chunk = b''
+        if chunk:
+            on_data(chunk)
+            return True
+
+        self.unregister(fd)
+        if on_eof is not None:
+            on_eof()
+        return False
+
+    def unregister(self, fd):
+        self.streams.pop(fd, None)
+        if self.selector is not None:
+            try:
+                self.selector.unregister(fd)
+            except (KeyError, ValueError):
+                pass
+
+    def run(self):
+        """
+        Pumps all registered streams until every one of them reached EOF or stop was called
+        """
+        for _ in self.iter_steps():
+            pass
+
+    def iter_steps(self):
+        """
+        Pumps like run, but yields after every wait for data, so the caller can handle what was read so far
+        (e.g. from a generator) without another thread
+        """
+        if self.selector is None:
+            for fd in list(self.streams):
+                while not self.stopping and self.read_chunk(fd):
+                    yield
+            return
+
+        while self.streams and not self.stopping:
+            self.run_once()
+            yield
+
+        if self.stopping:
+            self.drain()
+            yield
+
+    def run_once(self, timeout=None):
+        """
+        Waits once for data (or a wakeup) and dispatches whatever is ready
+        :param timeout: maximal seconds to wait, None waits until something happens
+        """
+        for key, _ in self.selector.select(timeout):
+            if key.fd == self.wakeup_read:
+                os.read(self.wakeup_read, self.chunk_size)
+            else:
+                self.read_chunk(key.fd)
+        self.register_pending()
+
+    def register_pending(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for stream, on_data, on_eof in pending:
+            self.register(stream, on_data, on_eof)
+
+    def drain(self, max_reads=64, fds=None):
+        """
+        Reads whatever is available right now without waiting for more data
+        :param max_reads: upper bound of chunks to read, so a writer that never stops can't hold the pump
+        :param fds: only drain these file descriptors (all streams by default)
+        """
+        while self.streams and max_reads > 0:
+            ready = [key.fd for key, _ in self.selector.select(0)
+                     if key.fd != self.wakeup_read and (fds is None or key.fd in fds)]
+            if not ready:
+                break
+            for fd in ready:
+                self.read_chunk(fd)
+                max_reads -= 1
+
+    def close(self):
+        if self.selector is not None:
+            wakeup_read, wakeup_write = self.wakeup_read, self.wakeup_write
+            self.wakeup_read, self.wakeup_write = None, None
+            self.selector.close()
+            self.selector = None
+            os.close(wakeup_read)
+            os.close(wakeup_write)
@@ -0,0 +1,139 @@
+import heapq
+import signal
+import itertools
+import threading
+import time
+
+# SIGKILL does not exist on windows, where Popen.kill and Popen.terminate are the same
+KILL_SIGNAL = getattr(signal, "SIGKILL", signal.SIGTERM)
+
+# deadlines are kept on the monotonic clock, so a step of the wall clock (NTP, vm resume) does not move them
+monotonic = getattr(time, "monotonic", time.time)
+
+
+class ScheduledCall(object):
+    def __init__(self, scheduler, deadline, callback, args):
+        self.scheduler = scheduler
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            self.scheduler.on_cancel()
+
+
+class TimeoutScheduler(object):
+    """
+    A single thread that fires callbacks at their deadlines, shared by many commands instead of a
+    threading.Timer (a thread) per command. The thread is started on first use.
+    """
+
+    def __init__(self, name="execute-timeouts"):
+        self.name = name
+        self.heap = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.cancelled_count = 0
+
+    def schedule(self, delay_sec, callback, *args):
+        """
+        Schedules callback(*args) to be called after delay_sec
+        :return: a ScheduledCall, call its cancel() to drop it
+        """
+        call = ScheduledCall(self, monotonic() + delay_sec, callback, args)
+        with self.condition:
+            heapq.heappush(self.heap, (call.deadline, next(self.counter), call))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=self.name)
+                self.thread.daemon = True
+                self.thread.start()
+            self.condition.notify()
+        return call
+
+    def on_cancel(self):
+        with self.condition:
+            self.cancelled_count += 1
+            # cancelled calls are dropped lazily, rebuild once they are most of the heap
+            if self.cancelled_count > 64 and self.cancelled_count * 2 > len(self.heap):
+                self.heap = [item for item in self.heap if not item[2].cancelled]
+                heapq.heapify(self.heap)
+                self.cancelled_count = 0
+
+    def pending(self):
+        with self.condition:
+            return len([c for _, _, c in self.heap if not c.cancelled])
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.heap:
+                    self.condition.wait()
+                deadline, _, call = self.heap[0]
+                now = monotonic()
+                if call.cancelled:
+                    heapq.heappop(self.heap)
+                    self.cancelled_count = max(0, self.cancelled_count - 1)
+                    continue
+                if deadline > now:
+                    self.condition.wait(deadline - now)
+                    continue
+                heapq.heappop(self.heap)
+            try:
+                call.callback(*call.args)
+            except Exception as e:
+                print(e)
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    :return: the process wide TimeoutScheduler
+    """
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_scheduler_lock:
+            if _default_scheduler is None:
+                _default_scheduler = TimeoutScheduler()
+    return _default_scheduler
+
+
+_flush_scheduler = None
+_flush_scheduler_lock = threading.Lock()
+
+
+def get_flush_scheduler():
+    """
+    :return: the process wide TimeoutScheduler of the deferred output and log flushes, a thread apart from the
+             timeouts one, so a flush that blocks on a slow file system doesn't delay the timeouts of the commands
+    """
+    global _flush_scheduler
+    if _flush_scheduler is None:
+        with _flush_scheduler_lock:
+            if _flush_scheduler is None:
+                _flush_scheduler = TimeoutScheduler(name="execute-flushes")
+    return _flush_scheduler
+
+
+class Escalation(object):
+    """
+    How a timed out process is stopped: the first signal is sent at the timeout and every next signal is sent
+    grace_sec later, if the process is still alive. The default kills the process right away.
+    """
+
+    def __init__(self, signals=None, grace_sec=5):
+        self.signals = list(signals) if signals else [KILL_SIGNAL]
+        self.grace_sec = grace_sec
+
+
+def terminate_then_kill(grace_sec=5):
+    """
+    :return: an Escalation that sends SIGTERM and then SIGKILL after grace_sec
+    """
+    return Escalation([signal.SIGTERM, KILL_SIGNAL], grace_sec)
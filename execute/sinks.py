@@ -0,0 +1,169 @@
+import sys
+import time
+import threading
+
+from execute.scheduler import get_flush_scheduler
+
+try:
+    from queue import Queue
+except ImportError:  # python 2
+    from Queue import Queue
+
+DEFAULT_BUFFER_SIZE = 256 * 1024
+
+
+class WritePolicy(object):
+    """
+    When the output written by Execute is flushed to its file, and how it is printed to the console
+    :param flush_interval: seconds between flushes of the output file, 0 flushes on every write,
+                           None flushes only by size (and when the command ends)
+    :param line_buffered: also flush whenever a line break is written
+    :param buffer_size: flush once this many characters were written since the last flush,
+                        it is also the buffer size the output file is opened with
+    :param console_thread: print to the console from a separate thread, so a slow terminal doesn't hold the reader
+    """
+
+    def __init__(self, flush_interval=0, line_buffered=False, buffer_size=DEFAULT_BUFFER_SIZE, console_thread=False):
+        self.flush_interval = flush_interval
+        self.line_buffered = line_buffered
+        self.buffer_size = buffer_size
+        self.console_thread = console_thread
+
+    def is_buffered(self):
+        return self.flush_interval != 0
+
+
+def buffered(flush_interval=1.0, line_buffered=False, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    A WritePolicy for high volume output, flushes at most once per flush_interval (or buffer_size characters)
+    and prints to the console from a separate thread
+    """
+    return WritePolicy(flush_interval, line_buffered=line_buffered, buffer_size=buffer_size, console_thread=True)
+
+
+class BufferedSink(object):
+    """
+    Writes to an output stream and flushes it according to a WritePolicy. Output that is still held when the
+    writes stop is flushed flush_interval seconds after it was written, by the flush scheduler.
+    """
+
+    def __init__(self, stream, policy):
+        self.stream = stream
+        self.policy = policy
+        self.pending = 0
+        self.last_flush = time.time()
+        self.lock = threading.Lock()
+        self.flush_call = None
+
+    def write(self, data):
+        with self.lock:
+            self.stream.write(data)
+            self.pending += len(data)
+            policy = self.policy
+            if policy.flush_interval == 0 or self.pending >= policy.buffer_size or \
+                    (policy.line_buffered and (b'\n' if isinstance(data, bytes) else "\n") in data) or \
+                    (policy.flush_interval is not None and time.time() - self.last_flush >= policy.flush_interval):
+                self._flush()
+            elif policy.flush_interval is not None and self.flush_call is None:
+                self.flush_call = get_flush_scheduler().schedule(policy.flush_interval, self.deferred_flush)
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def deferred_flush(self):
+        with self.lock:
+            self.flush_call = None
+            if self.pending:
+                try:
+                    self._flush()
+                except ValueError:  # the stream was closed meanwhile
+                    pass
+
+    def _flush(self):
+        if self.flush_call is not None:
+            self.flush_call.cancel()
+            self.flush_call = None
+        self.stream.flush()
+        self.pending = 0
+        self.last_flush = time.time()
+
+
+class ConsoleWriter(object):
+    """
+    A single thread that prints output to the console (sys.stdout at the time of the write),
+    batching whatever was queued into one flush. The thread is started on first use.
+    """
+
+    def __init__(self, name="execute-console"):
+        self.name = name
+        self.queue = Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def write(self, data):
+        """
+        Queues str or bytes to be printed
+        """
+        self.start()
+        self.queue.put((sys.stdout, data))
+
+    def wait(self):
+        """
+        Waits until everything queued before the call was printed
+        """
+        if self.thread is None:
+            return
+        done = threading.Event()
+        self.queue.put((None, done))
+        done.wait()
+
+    def start(self):
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    thread = threading.Thread(target=self._run, name=self.name)
+                    thread.daemon = True
+                    thread.start()
+                    self.thread = thread
+
+    def _run(self):
+        while True:
+            written = set()
+            item = self.queue.get()
+            while item is not None:
+                stream, data = item
+                if stream is None:
+                    self._flush(written)
+                    data.set()
+                else:
+                    if isinstance(data, bytes) and hasattr(stream, "buffer"):
+                        if stream in written:  # keep the order of text already written to the stream
+                            stream.flush()
+                        stream = stream.buffer
+                    try:
+                        stream.write(data)
+                        written.add(stream)
+                    except Exception:  # a console that can't be written to must not stop the writer
+                        pass
+                item = None if self.queue.empty() else self.queue.get()
+            self._flush(written)
+
+    @staticmethod
+    def _flush(streams):
+        for stream in streams:
+            try:
+                stream.flush()
+            except Exception:
+                pass
+        streams.clear()
+
+
+_console_writer = ConsoleWriter()
+
+
+def get_console_writer():
+    """
+    :return: the console writer shared by all commands of the process
+    """
+    return _console_writer
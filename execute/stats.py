@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import threading
+
+# ru_maxrss is in kilobytes on linux and in bytes on mac
+MAX_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+class ExecuteStats(object):
+    """
+    Resource accounting of a single command.
+    Cpu times and max_rss_bytes are of the process itself (from os.wait4), None where they are not available.
+    """
+
+    def __init__(self):
+        self.wall_sec = 0
+        self.user_cpu_sec = None
+        self.system_cpu_sec = None
+        self.max_rss_bytes = None
+        self.output_bytes = 0
+        self.output_lines = 0
+        self.first_output_sec = None
+
+    def on_output(self, chunk, elapsed_sec):
+        if self.first_output_sec is None:
+            self.first_output_sec = elapsed_sec
+        self.output_bytes += len(chunk)
+        self.output_lines += chunk.count(b'\n')
+
+    def set_rusage(self, rusage):
+        self.user_cpu_sec = rusage.ru_utime
+        self.system_cpu_sec = rusage.ru_stime
+        self.max_rss_bytes = rusage.ru_maxrss * MAX_RSS_UNIT
+
+    @property
+    def lines_per_sec(self):
+        return self.output_lines / self.wall_sec if self.wall_sec > 0 else 0
+
+    def to_dict(self):
+        return {"wall_sec": self.wall_sec, "user_cpu_sec": self.user_cpu_sec, "system_cpu_sec": self.system_cpu_sec,
+                "max_rss_bytes": self.max_rss_bytes, "output_bytes": self.output_bytes,
+                "output_lines": self.output_lines, "lines_per_sec": self.lines_per_sec,
+                "first_output_sec": self.first_output_sec}
+
+
+# executables whose first argument is a sub command, the metric names of other commands are their executable only,
+# so arguments (scripts, build numbers) don't add a registry entry and a label per value
+SUBCOMMAND_TOOLS = {"git", "docker", "kubectl", "helm", "pip", "npm", "cargo", "go", "conda", "apt-get"}
+
+
+def command_metric_name(command):
+    """
+    Names the metric of a command by its executable, and its sub command for SUBCOMMAND_TOOLS,
+    e.g. "git describe"
+    :param command: the command as a list of arguments
+    """
+    if not command:
+        return ""
+    name = os.path.splitext(os.path.basename(command[0]))[0]
+    if name in SUBCOMMAND_TOOLS and len(command) > 1 and not command[1].startswith("-"):
+        name = "{} {}".format(name, command[1])
+    return name
+
+
+class CommandMetrics(object):
+    """
+    The aggregated stats of the commands recorded under one name
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.wall_sec = 0.0
+        self.max_wall_sec = 0.0
+        self.user_cpu_sec = 0.0
+        self.system_cpu_sec = 0.0
+        self.max_rss_bytes = 0
+        self.output_bytes = 0
+        self.output_lines = 0
+
+    def add(self, execute):
+        stats = execute.stats
+        self.count += 1
+        if execute.return_code != 0:
+            self.failures += 1
+        if execute.timed_out():
+            self.timeouts += 1
+        self.wall_sec += stats.wall_sec
+        self.max_wall_sec = max(self.max_wall_sec, stats.wall_sec)
+        self.user_cpu_sec += stats.user_cpu_sec or 0
+        self.system_cpu_sec += stats.system_cpu_sec or 0
+        self.max_rss_bytes = max(self.max_rss_bytes, stats.max_rss_bytes or 0)
+        self.output_bytes += stats.output_bytes
+        self.output_lines += stats.output_lines
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+# prometheus metric name, CommandMetrics attribute, type, help
+PROMETHEUS_METRICS = [
+    ("execute_commands_total", "count", "counter", "Commands executed"),
+    ("execute_failures_total", "failures", "counter", "Commands that returned a non zero code"),
+    ("execute_timeouts_total", "timeouts", "counter", "Commands killed by timeout"),
+    ("execute_wall_seconds_total", "wall_sec", "counter", "Wall clock seconds of the commands"),
+    ("execute_wall_seconds_max", "max_wall_sec", "gauge", "Longest wall clock seconds of a command"),
+    ("execute_user_cpu_seconds_total", "user_cpu_sec", "counter", "User cpu seconds of the commands"),
+    ("execute_system_cpu_seconds_total", "system_cpu_sec", "counter", "System cpu seconds of the commands"),
+    ("execute_max_rss_bytes", "max_rss_bytes", "gauge", "Largest resident set size of a command"),
+    ("execute_output_bytes_total", "output_bytes", "counter", "Output bytes of the commands"),
+    ("execute_output_lines_total", "output_lines", "counter", "Output lines of the commands"),
+]
+
+
+def escape_label(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class MetricsRegistry(object):
+    """
+    Aggregates the stats of executed commands by command name (see command_metric_name),
+    run and run_git record every command in the process wide registry (get_metrics)
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.commands = {}
+
+    def record(self, execute, name=None):
+        """
+        Adds the stats of a finished command
+        :param execute: the Execute result
+        :param name: the metric name, by default named after the command
+        """
+        if not self.enabled or execute.command is None:
+            return
+        if name is None:
+            name = command_metric_name(execute.command)
+        with self.lock:
+            metrics = self.commands.get(name)
+            if metrics is None:
+                metrics = self.commands[name] = CommandMetrics()
+            metrics.add(execute)
+
+    def clear(self):
+        with self.lock:
+            self.commands = {}
+
+    def slowest(self, count=10):
+        """
+        :return: a list of (name, CommandMetrics) of the commands that took the most wall clock time in total
+        """
+        with self.lock:
+            items = list(self.commands.items())
+        return sorted(items, key=lambda item: item[1].wall_sec, reverse=True)[:count]
+
+    def to_dict(self):
+        with self.lock:
+            return {name: metrics.to_dict() for name, metrics in self.commands.items()}
+
+    def to_json(self, indent=None):
+        return json.dumps(self.to_dict(), indent=indent, sort_keys=True)
+
+    def to_prometheus(self):
+        """
+        :return: the metrics in the prometheus text exposition format, labeled by command
+        """
+        with self.lock:
+            items = sorted(self.commands.items())
+        lines = []
+        for metric, attribute, metric_type, description in PROMETHEUS_METRICS:
+            lines.append("# HELP {} {}".format(metric, description))
+            lines.append("# TYPE {} {}".format(metric, metric_type))
+            for name, metrics in items:
+                lines.append("{}{{command=\"{}\"}} {}".format(metric, escape_label(name), getattr(metrics, attribute)))
+        return "\n".join(lines) + "\n"
+
+
+_metrics = MetricsRegistry()
+
+
+def get_metrics():
+    """
+    :return: the metrics registry shared by the process
+    """
+    return _metrics
@@ -1,21 +1,138 @@
 import argparse
 import os
+import atexit
+import threading
 import errno
 import datetime
 import json
 import shutil
+from collections import OrderedDict
+
+from execute.scheduler import get_flush_scheduler
 
 workspace = ""
 
 
+LOG_FLUSH_INTERVAL_SEC = 1.0
+
+
+class LogWriter(object):
+    """
+    Appends to a log file over a handle that is kept open, writes are buffered and flushed at most
+    flush_interval seconds after they were made (by the flush scheduler). Thread-safe.
+    """
+
+    def __init__(self, path, mode="a", flush_interval=LOG_FLUSH_INTERVAL_SEC):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.flush_call = None
+        self.log = open(path, mode)
+
+    def write(self, content):
+        """
+        :return: False if the writer was closed (e.g. evicted from the registry) and nothing was written
+        """
+        with self.lock:
+            if self.log.closed:
+                return False
+            self.log.write(content)
+            if not self.flush_interval:
+                self.log.flush()
+            elif self.flush_call is None:
+                self.flush_call = get_flush_scheduler().schedule(self.flush_interval, self.flush)
+            return True
+
+    def flush(self):
+        with self.lock:
+            self.flush_call = None
+            if not self.log.closed:
+                self.log.flush()
+
+    def close(self):
+        with self.lock:
+            if self.flush_call is not None:
+                self.flush_call.cancel()
+                self.flush_call = None
+            try:
+                self.log.close()
+            except (IOError, OSError):  # the buffered content could not be written (e.g. the file is gone)
+                pass
+
+
+MAX_OPEN_LOGS = 64
+_log_writers = OrderedDict()
+_log_writers_lock = threading.Lock()
+
+
+def open_log_writer(log_path, mode):
+    try:
+        return LogWriter(log_path, mode)
+    except (IOError, OSError) as e:
+        if e.errno != errno.ENOENT:
+            raise
+    create_dir_for_file(os.path.join(os.path.dirname(log_path), ""))  # the log directory does not exist (yet)
+    return LogWriter(log_path, mode)
+
+
+def get_log_writer(log_path, mode="a"):
+    """
+    Writers are kept for the MAX_OPEN_LOGS most recently written paths, the least recently used are closed.
+    A writer whose file was removed is replaced by a new one, so the file is created again.
+    :param log_path: the log file path
+    :param mode: "a" appends to the file, "w" truncates it first (and reopens the kept handle)
+    :return: the LogWriter of the path, shared by the process
+    """
+    log_path = os.path.abspath(log_path)
+    with _log_writers_lock:
+        writer = _log_writers.get(log_path)
+        if writer is not None:
+            if mode == "a" and os.path.exists(log_path):
+                _log_writers.move_to_end(log_path)
+                return writer
+            del _log_writers[log_path]
+            writer.close()
+        writer = _log_writers[log_path] = open_log_writer(log_path, mode)
+        while len(_log_writers) > MAX_OPEN_LOGS:
+            _log_writers.popitem(last=False)[1].close()
+        return writer
+
+
+def flush_logs():
+    """
+    Flushes all the log files written by write_log
+    """
+    with _log_writers_lock:
+        writers = list(_log_writers.values())
+    for writer in writers:
+        writer.flush()
+
+
+def close_logs():
+    """
+    Closes all the log files written by write_log, they are reopened by the next write
+    """
+    with _log_writers_lock:
+        writers = list(_log_writers.values())
+        _log_writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+atexit.register(close_logs)
+
+
 def write_log(relative_path, content, console=True, mode="a"):
+    """
+    Writes a line to a log file (relative to workspace), through the kept LogWriter of the file.
+    Call flush_logs() before reading a log that was just written.
+    """
     if console is True:
         print(content)
     if relative_path is not None:
         log_path = os.path.join(workspace, relative_path)
-        create_dir_for_file(log_path)
-        with open(log_path, mode) as log:
-            log.write("{}\n".format(content))
+        while not get_log_writer(log_path, mode).write("{}\n".format(content)):
+            mode = "a"  # the writer was closed by another thread after it was taken, take the new one
 
 
 def create_dir_for_file(path):
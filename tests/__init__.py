@@ -15,7 +15,6 @@ def test_git():
     print(res)
 
 
-test_git()
 """
 def run_command(command):
     process = subprocess.Popen(shlex.split(command), stdout=subprocess.PIPE)
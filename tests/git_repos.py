@@ -0,0 +1,107 @@
+"""
+Generates local git repositories (no network needed), shared by the git tests and the git benchmarks
+"""
+import os
+import subprocess
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "bench",
+    "GIT_AUTHOR_EMAIL": "bench@localhost",
+    "GIT_COMMITTER_NAME": "bench",
+    "GIT_COMMITTER_EMAIL": "bench@localhost",
+    "GIT_CONFIG_NOSYSTEM": "1",
+}
+
+
+def git(cwd, *args, **kwargs):
+    env = dict(os.environ)
+    env.update(GIT_ENV)
+    return subprocess.check_output(["git", "-c", "protocol.file.allow=always"] + list(args), cwd=cwd, env=env,
+                                   stderr=subprocess.STDOUT, **kwargs).decode("utf-8").strip()
+
+
+def create_repo(path, commits=3, branches=0, tags=0, url=None):
+    """
+    Creates a repository with a linear history, tags on its first commits and branches pointing at its commits
+    :param path: the repository directory (created)
+    :param commits: number of commits
+    :param branches: number of branches, packed as refs/remotes/origin/branch_<n> (like a fetched clone)
+    :param tags: number of annotated tags, named release_<counter>
+    :param url: remote.origin.url of the repository
+    :return: the path
+    """
+    os.makedirs(path)
+    git(path, "init", "-q", "-b", "master")
+    git(path, "config", "remote.origin.url", url or "https://git.example.com/bench/{}.git".format(
+        os.path.basename(path)))
+    hashes = []
+    for i in range(commits):
+        with open(os.path.join(path, "file.txt"), "a") as f:
+            f.write("{}\n".format(i))
+        git(path, "add", "file.txt")
+        git(path, "commit", "-q", "-m", "commit {}".format(i))
+        hashes.append(git(path, "rev-parse", "HEAD"))
+
+    for i in range(tags):
+        git(path, "tag", "-a", "-m", "tag", "release_{:03d}".format(i), hashes[min(i, len(hashes) - 1)])
+
+    if branches:
+        updates = "".join("create refs/remotes/origin/branch_{} {}\n".format(i, hashes[i % len(hashes)])
+                          for i in range(branches))
+        git(path, "update-ref", "--stdin", input=updates.encode("utf-8"))
+        git(path, "pack-refs", "--all")
+    return path
+
+
+def create_superproject(root, submodules=0, branches=0, tags=0, commits=3):
+    """
+    Creates a project with submodules, each module is created as a repository next to the project and added
+    with 'git submodule add'
+    :param root: an existing directory to create the repositories in
+    :return: the project path
+    """
+    project = create_repo(os.path.join(root, "project"), commits=commits, branches=branches, tags=tags)
+    for i in range(submodules):
+        module = create_repo(os.path.join(root, "module_{}".format(i)), commits=commits, branches=branches,
+                             tags=tags)
+        git(project, "submodule", "add", "-q", module, "modules/module_{}".format(i))
+        module_path = os.path.join(project, "modules", "module_{}".format(i))
+        git(module_path, "config", "remote.origin.url", "https://git.example.com/bench/module_{}.git".format(i))
+    if submodules:
+        git(project, "commit", "-q", "-m", "add submodules")
+    return project
+
+
+def create_history_repo(path, commits=500, branches=1000, branch_tips=50, seed=1):
+    """
+    Creates a repository with a long linear history (written with git fast-import) and many remote branches
+    :param path: the repository directory (created)
+    :param commits: number of commits on master
+    :param branches: number of refs/remotes/origin/branch_<n> refs
+    :param branch_tips: number of distinct commits the branches point at (all older than master tip)
+    :return: the list of commit hashes, oldest first
+    """
+    import random
+    os.makedirs(path)
+    git(path, "init", "-q", "-b", "master")
+    git(path, "config", "remote.origin.url", "https://git.example.com/bench/history.git")
+    stream = []
+    for i in range(commits):
+        message = "commit {}".format(i)
+        content = "{}\n".format(i)
+        stream.append("commit refs/heads/master\n"
+                      "committer bench <bench@localhost> {} +0000\n"
+                      "data {}\n{}\n"
+                      "M 644 inline file.txt\n"
+                      "data {}\n{}\n".format(1600000000 + i, len(message), message, len(content), content))
+    git(path, "fast-import", "--quiet", input="".join(stream).encode("utf-8"))
+    git(path, "checkout", "-q", "master")
+    hashes = git(path, "rev-list", "--reverse", "master").split()
+
+    rand = random.Random(seed)
+    tips = rand.sample(hashes[:-1], min(branch_tips, len(hashes) - 1))
+    updates = "".join("create refs/remotes/origin/branch_{} {}\n".format(i, tips[i % len(tips)])
+                      for i in range(branches))
+    git(path, "update-ref", "--stdin", input=updates.encode("utf-8"))
+    git(path, "pack-refs", "--all")
+    return hashes
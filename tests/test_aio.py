@@ -0,0 +1,29 @@
+import sys
+import asyncio
+
+from execute.aio import async_run
+
+
+def test_async_run_many():
+    async def run_all():
+        cmds = [[sys.executable, "-c", "print({})".format(i)] for i in range(20)]
+        return await asyncio.gather(*[async_run(cmd, console=False) for cmd in cmds])
+
+    results = asyncio.run(run_all())
+    assert [r.return_code for r in results] == [0] * 20
+    assert [r.get_output_lines()[-1] for r in results] == [str(i) for i in range(20)]
+
+
+def test_async_run_timeout():
+    result = asyncio.run(async_run([sys.executable, "-c", "import time; time.sleep(10)"], console=False,
+                                   timeout_sec=0.5))
+    assert result.timed_out()
+    assert result.duration < 5
+
+
+def test_async_run_timeout_after_output_closed():
+    code = "import os, time; os.close(1); os.close(2); time.sleep(10)"
+    result = asyncio.run(async_run([sys.executable, "-c", code], console=False, timeout_sec=0.5))
+    assert result.timed_out()
+    assert result.return_code != 0
+    assert result.duration < 5
@@ -0,0 +1,104 @@
+import socket
+import threading
+
+from execute.email import Mailer
+
+
+class FakeSmtpServer(object):
+    """
+    A minimal SMTP server on localhost that keeps the mails it got, it drops a connection after
+    drop_after mails to check reconnecting and refuses the recipients in refuse
+    """
+
+    def __init__(self, drop_after=None, refuse=()):
+        self.drop_after = drop_after
+        self.refuse = set(refuse)
+        self.rcpt_commands = 0
+        self.mails = []
+        self.connections = 0
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(5)
+        self.port = self.listener.getsockname()[1]
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def serve(self):
+        while True:
+            try:
+                connection, _ = self.listener.accept()
+            except socket.error:
+                return
+            self.connections += 1
+            with connection:
+                self.handle(connection.makefile("rb"), connection)
+
+    def handle(self, reader, connection):
+        connection.sendall(b"220 localhost ready\r\n")
+        mails = 0
+        for line in reader:
+            command = line.strip().split(b" ")[0].upper()
+            if command == b"DATA":
+                connection.sendall(b"354 go ahead\r\n")
+                data = []
+                for data_line in reader:
+                    if data_line == b".\r\n":
+                        break
+                    data.append(data_line)
+                self.mails.append(b"".join(data))
+                connection.sendall(b"250 queued\r\n")
+                mails += 1
+                if self.drop_after is not None and mails >= self.drop_after:
+                    return
+            elif command == b"RCPT":
+                self.rcpt_commands += 1
+                refused = any(recipient.encode("utf-8") in line for recipient in self.refuse)
+                connection.sendall(b"550 no such user\r\n" if refused else b"250 ok\r\n")
+            elif command == b"QUIT":
+                connection.sendall(b"221 bye\r\n")
+                return
+            else:  # EHLO, HELO, MAIL, RSET, NOOP
+                connection.sendall(b"250 ok\r\n")
+
+    def close(self):
+        self.listener.close()
+
+
+def test_mailer_batches_over_one_connection():
+    server = FakeSmtpServer()
+    with Mailer("127.0.0.1", server.port, sender_email="ci@localhost", batch_size=4) as mailer:
+        for i in range(10):
+            assert mailer.send("dev@localhost", "build {} failed".format(i), "details")
+        mailer.flush()
+        assert mailer.sent == 10
+    server.close()
+    assert len(server.mails) == 10
+    assert server.connections == 1
+    assert b"Subject: build 9 failed" in server.mails[-1]
+    assert mailer.errors == []
+
+
+def test_mailer_reconnects():
+    server = FakeSmtpServer(drop_after=3)
+    with Mailer("127.0.0.1", server.port, sender_email="ci@localhost") as mailer:
+        for i in range(7):
+            mailer.send("dev@localhost", "mail {}".format(i), "body")
+    server.close()
+    assert mailer.sent == 7 and mailer.errors == []
+    assert len(server.mails) == 7
+    assert server.connections == 3
+
+
+def test_mailer_refused_recipient_keeps_connection():
+    import smtplib
+    server = FakeSmtpServer(refuse=["nobody@localhost"])
+    with Mailer("127.0.0.1", server.port, sender_email="ci@localhost") as mailer:
+        for i in range(3):
+            mailer.send("nobody@localhost", "mail {}".format(i), "body")
+        mailer.send("dev@localhost", "mail 3", "body")
+    server.close()
+    assert mailer.sent == 1 and len(mailer.errors) == 3
+    assert all(isinstance(e, smtplib.SMTPRecipientsRefused) for _, e in mailer.errors)
+    assert server.rcpt_commands == 4  # refused mails are not sent again
+    assert server.connections == 1
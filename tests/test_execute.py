@@ -0,0 +1,314 @@
+import sys
+import time
+
+from execute import run
+
+
+def python_cmd(code):
+    return [sys.executable, "-c", code]
+
+
+def test_output_without_trailing_newline():
+    result = run(python_cmd("import sys; sys.stdout.write('first\\nsecond')"), console=False)
+    assert result.return_code == 0
+    assert result.get_output_lines(exclude_cwd=True)[-2:] == ["first", "second"]
+
+
+def test_multibyte_split_between_chunks():
+    code = "import sys, time\n" \
+           "out = sys.stdout.buffer\n" \
+           "data = u'\\u05e9\\u05dc\\u05d5\\u05dd'.encode('utf-8')\n" \
+           "out.write(data[:1]); out.flush(); time.sleep(0.2); out.write(data[1:]); out.flush()\n"
+    result = run(python_cmd(code), console=False)
+    assert result.get_output_lines()[-1] == u"שלום"
+
+
+def test_timeout():
+    result = run(python_cmd("import time; time.sleep(10)"), console=False, timeout_sec=1)
+    assert result.timed_out()
+    assert result.duration < 5
+
+
+def test_tail_capture_keeps_last_output(tmp_path):
+    log_path = str(tmp_path / "full.log")
+    code = "for i in range(20000): print('line {}'.format(i))"
+    result = run(python_cmd(code), output_path=log_path, console=False, capture="tail", max_bytes=1000)
+    lines = result.get_output_lines()
+    assert lines[-1] == "line 19999"
+    assert len(result.get_output()) <= 1000
+    assert lines[0].startswith("line ")
+    assert result.get_tail_lines(3) == ["line 19997", "line 19998", "line 19999"]
+    with open(log_path) as log:
+        assert log.read().count("\n") == 20002
+
+
+def test_exception_details_from_tail():
+    from execute.exceptions import ExecuteException
+    result = run(python_cmd("for i in range(100): print(i)"), console=False, capture="tail", max_bytes=64)
+    assert ExecuteException(execute_result=result).get_details() == "95\n96\n97\n98\n99"
+
+
+def test_timeout_escalation():
+    import threading
+    from execute.scheduler import terminate_then_kill
+    code = "import signal, sys, time\n" \
+           "signal.signal(signal.SIGTERM, signal.SIG_IGN)\n" \
+           "print('ready'); sys.stdout.flush()\n" \
+           "time.sleep(10)\n"
+    threads_before = threading.active_count()
+    result = run(python_cmd(code), console=False, timeout_sec=0.5, escalation=terminate_then_kill(0.5))
+    assert result.timed_out()
+    assert result.return_code != 0
+    assert 1 <= result.duration < 5
+    assert threading.active_count() <= threads_before + 1
+
+
+def test_iter_lines_while_running():
+    from execute import Execute
+    code = "import sys, time\n" \
+           "print('first'); sys.stdout.flush()\n" \
+           "time.sleep(0.3)\n" \
+           "sys.stdout.write('second\\r\\nlast')\n"
+    execute = Execute(console=False)
+    lines = list(execute.iter_lines(python_cmd(code)))
+    assert lines == ["first", "second", "last"]
+    assert execute.return_code == 0
+    assert execute.get_output_lines(exclude_command=True, exclude_cwd=True) == lines
+
+
+def test_iter_lines_abort_kills_process():
+    from execute import Execute
+    code = "import sys, time\n" \
+           "print('fatal'); sys.stdout.flush()\n" \
+           "time.sleep(10)\n"
+    execute = Execute(console=False)
+    for line in execute.iter_lines(python_cmd(code)):
+        if line == "fatal":
+            break
+    assert execute.return_code != 0
+    assert execute.duration < 5
+
+
+def test_on_line_callback():
+    lines = []
+    result = run(python_cmd("print('a'); print('b')"), console=False, on_line=lines.append)
+    assert lines == ["a", "b"]
+    assert result.get_output_lines(exclude_command=True) == result.get_output_lines()[:1] + lines
+
+
+def test_bytes_capture(tmp_path):
+    import hashlib
+    from execute.capture import CAPTURE_BYTES, CAPTURE_NONE
+    code = "import sys\n" \
+           "out = getattr(sys.stdout, 'buffer', sys.stdout)\n" \
+           "out.write(b'\\x00\\xff' * 5000 + u'\\n\\u05e9'.encode('utf-8'))\n"
+    data = b'\x00\xff' * 5000 + u'\nש'.encode('utf-8')
+    for spool_bytes in (None, 1024):
+        result = run(python_cmd(code), console=False, capture=CAPTURE_BYTES, spool_bytes=spool_bytes)
+        assert result.return_code == 0
+        assert bytes(result.get_output_bytes()).endswith(data)
+        assert result.get_output_lines()[-1] == u"ש"
+
+    output_path = str(tmp_path / "out.log")
+    result = run(python_cmd(code), output_path, console=False, capture=CAPTURE_NONE)
+    assert hashlib.sha1(result.get_output_bytes()[-len(data):]).digest() == hashlib.sha1(data).digest()
+
+    result = run(python_cmd(code), console=False, capture=CAPTURE_NONE)
+    assert result.return_code == 0
+    assert len(result.get_output_bytes()) == 0
+
+
+def test_buffered_write_policy(tmp_path, capsys):
+    from execute.sinks import buffered
+    output_path = str(tmp_path / "out.log")
+    code = "for i in range(20000): print('line %d' % i)"
+    result = run(python_cmd(code), output_path, console=True, write_policy=buffered(flush_interval=None))
+    assert result.get_tail_lines(1) == ["line 19999"]
+    assert capsys.readouterr().out.strip().splitlines()[-1] == "line 19999"
+    with open(output_path) as out:
+        assert len(out.read().splitlines()) == 20002
+
+
+def test_buffered_write_policy_flushes_paused_output(tmp_path):
+    import threading
+    from execute import Execute
+    from execute.sinks import WritePolicy
+    output_path = str(tmp_path / "out.log")
+    code = "import sys, time; print('first'); sys.stdout.flush(); time.sleep(2)"
+    execute = Execute(console=False, write_policy=WritePolicy(flush_interval=0.3))
+    thread = threading.Thread(target=execute.execute, args=(python_cmd(code), output_path))
+    thread.start()
+    try:
+        content = ""
+        for _ in range(15):
+            time.sleep(0.1)
+            with open(output_path) as out:
+                content = out.read()
+            if "first" in content:
+                break
+        assert content.splitlines()[-1] == "first"
+    finally:
+        thread.join()
+
+
+def test_deferred_flush_does_not_hold_timeouts():
+    import threading
+    from execute.scheduler import get_scheduler
+    from execute.sinks import BufferedSink, WritePolicy
+
+    class StalledStream(object):  # a file on a stalled mount
+        def __init__(self):
+            self.flushing = threading.Event()
+            self.release = threading.Event()
+
+        def write(self, data):
+            pass
+
+        def flush(self):
+            self.flushing.set()
+            self.release.wait(10)
+
+    stream = StalledStream()
+    sink = BufferedSink(stream, WritePolicy(flush_interval=0.05))
+    sink.write("held")
+    try:
+        assert stream.flushing.wait(5)
+        fired = threading.Event()
+        get_scheduler().schedule(0.05, fired.set)
+        assert fired.wait(2)
+    finally:
+        stream.release.set()
+
+
+def process_running(pid):
+    try:
+        with open("/proc/{}/stat".format(pid)) as stat:
+            return stat.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except IOError:
+        return False
+
+
+def spawn_grandchild_cmd():
+    # prints the pid of a grandchild that keeps the output pipe open
+    return python_cmd("import subprocess, sys, time\n"
+                      "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n"
+                      "print(child.pid); sys.stdout.flush()\n"
+                      "time.sleep(30)\n")
+
+
+def test_process_group_timeout_kills_grandchildren():
+    import pytest
+    if not sys.platform.startswith("linux"):
+        pytest.skip("checks the processes in /proc")
+    result = run(spawn_grandchild_cmd(), console=False, timeout_sec=1, process_group=True)
+    assert result.timed_out()
+    assert result.duration < 10
+    grandchild = int(result.get_output_lines(exclude_command=True, exclude_cwd=True)[0])
+    for _ in range(50):
+        if not process_running(grandchild):
+            break
+        time.sleep(0.1)
+    assert not process_running(grandchild)
+
+
+def test_reused_execute_resets_results():
+    import pytest
+    if not sys.platform.startswith("linux"):
+        pytest.skip("checks the processes in /proc")
+    from execute import Execute
+    execute = Execute(console=False, process_group=True)
+    for _ in range(2):
+        execute.execute(spawn_grandchild_cmd(), timeout_sec=1)
+        assert execute.timed_out()
+        lines = execute.get_output_lines(exclude_command=True, exclude_cwd=True)
+        assert len(lines) == 1
+        grandchild = int(lines[0])
+        for _ in range(50):
+            if not process_running(grandchild):
+                break
+            time.sleep(0.1)
+        assert not process_running(grandchild)
+        assert execute.stats.output_bytes == len(lines[0]) + 1
+
+    execute.execute([sys.executable, "-c", "print('done')"])
+    assert not execute.timed_out() and execute.return_code == 0
+    assert execute.get_output_lines()[-1] == "done"
+
+
+def test_kill_all():
+    import threading
+    from execute import Execute, kill_all
+    from execute.pool import ExecutePool
+    executes = [Execute(console=False, process_group=True) for _ in range(2)]
+    threads = [threading.Thread(target=execute.execute, args=(spawn_grandchild_cmd(),)) for execute in executes]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    with ExecutePool(max_workers=2, process_group=True) as pool:
+        for _ in range(2):
+            pool.submit(spawn_grandchild_cmd())
+        while len(pool.running) < 2 or any(execute.running_process is None for execute in executes):
+            time.sleep(0.05)
+        time.sleep(0.5)
+        assert pool.kill_all() == 2
+        results = list(pool.as_completed())
+    assert kill_all() == 2
+    for thread in threads:
+        thread.join(10)
+    assert time.time() - start < 10
+    assert all(result.return_code != 0 for result in results + executes)
+
+
+def test_run_cache(tmp_path):
+    from execute.command_cache import CommandCache
+    counter = tmp_path / "runs"
+    depends = tmp_path / "input.txt"
+    depends.write_text(u"1")
+    cmd = python_cmd("import sys; open(sys.argv[1], 'a').write('x'); print('result')") + [str(counter)]
+    cache = CommandCache(directory=str(tmp_path / "cache"))
+    results = [run(cmd, console=False, cache=cache, cache_files=[str(depends)]) for _ in range(3)]
+    assert counter.read_text() == u"x"
+    assert [r.cached for r in results] == [False, True, True]
+    assert results[-1].get_output_lines(exclude_command=True, exclude_cwd=True) == ["result"]
+    assert results[-1].get_output() == results[0].get_output()
+
+    disk_result = run(cmd, console=False, cache=CommandCache(directory=str(tmp_path / "cache")),
+                      cache_files=[str(depends)])
+    assert disk_result.cached and counter.read_text() == u"x"
+
+    depends.write_text(u"22")
+    assert not run(cmd, console=False, cache=cache, cache_files=[str(depends)]).cached
+    assert not run(cmd, console=False, cache=CommandCache(ttl_sec=0), cache_files=[str(depends)]).cached
+    assert cache.to_dict()["hits"] == 2 and cache.to_dict()["misses"] == 2
+    assert not run(python_cmd("import sys; sys.exit(1)"), console=False, cache=cache).cached
+    assert not run(python_cmd("import sys; sys.exit(1)"), console=False, cache=cache).cached
+
+
+def test_fast_spawn(tmp_path, monkeypatch):
+    import os
+    import subprocess
+    from execute import split_command
+    monkeypatch.setattr(subprocess, "_USE_VFORK", False, raising=False)  # the posix_spawn set up
+    code = "import os; print(os.getcwd()); print(os.environ['SPAWN_VAR']); print('PATH' in os.environ)"
+    for cwd in (None, str(tmp_path)):
+        env = {"SPAWN_VAR": "x", "PATH": os.pathsep.join([os.path.dirname(sys.executable), os.environ["PATH"]])}
+        result = run([os.path.basename(sys.executable), "-c", code], console=False, cwd=cwd, env=env,
+                     fast_spawn=True)
+        assert result.return_code == 0
+        assert result.get_output_lines(exclude_command=True, exclude_cwd=True) == \
+            [os.path.realpath(cwd or os.getcwd()), "x", "True"]
+    command = split_command('git log -1 --format="%H %s"')
+    command.append("--")
+    assert split_command('git log -1 --format="%H %s"') == ["git", "log", "-1", "--format=%H %s"]
+
+
+def test_scheduler_ignores_wall_clock_steps(monkeypatch):
+    from execute.scheduler import TimeoutScheduler
+    scheduler = TimeoutScheduler()
+    fired = []
+    scheduler.schedule(0.2, fired.append, "short")
+    scheduler.schedule(60, fired.append, "long")
+    wall_clock = time.time
+    monkeypatch.setattr(time, "time", lambda: wall_clock() + 3600)  # the wall clock jumps an hour forward
+    time.sleep(0.5)
+    assert fired == ["short"]
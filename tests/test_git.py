@@ -0,0 +1,329 @@
+import os
+
+from tests.git_repos import create_history_repo, create_repo, create_superproject, git
+from execute.git import get_info, parse_describe, select_branch
+
+
+def test_parse_describe():
+    head = "a" * 40
+    assert parse_describe("release_1-2-3-g{}".format(head)) == ("release_1-2", 3, head)
+    assert parse_describe(head) == (None, None, head)
+    assert parse_describe("fatal: not a git repository") == (None, None, None)
+
+
+def test_select_branch():
+    assert select_branch(["refs/heads/master", "refs/remotes/origin/master"]) == "master"
+    assert select_branch(["* (HEAD detached at 1234567)", "remotes/origin/dev"]) == "dev"
+    assert select_branch(["remotes/origin/release_1", "remotes/origin/release_2"], "release_2_005") == "release_2"
+    assert select_branch([]) is None
+
+
+def test_batched_info_matches_per_field(tmp_path):
+    project = create_superproject(str(tmp_path), submodules=2, branches=0, tags=3)
+    git(os.path.join(project, "modules", "module_1"), "checkout", "-q", "HEAD~1")
+    assert get_info(project, batched=True).to_json() == get_info(project, batched=False).to_json()
+
+
+def test_concurrent_info_matches_serial(tmp_path):
+    project = create_superproject(str(tmp_path), submodules=4, tags=2)
+    assert get_info(project, max_workers=4).to_json() == get_info(project).to_json()
+
+
+def assert_reader_matches_git(path, tags):
+    import execute.git
+    from execute.git_reader import GitReader
+    reader = GitReader(path)
+    assert reader.head_hash() == git(path, "rev-parse", "HEAD")
+    assert reader.remote_url() == git(path, "config", "remote.origin.url")
+    for tag in tags:
+        assert reader.commit_hash(tag) == git(path, "rev-list", "-1", tag)
+    execute.git.USE_GIT_READER = False
+    try:
+        expected = get_info(path).to_json()
+    finally:
+        execute.git.USE_GIT_READER = True
+    assert get_info(path).to_json() == expected
+
+
+def test_git_reader_loose_and_packed(tmp_path):
+    project = create_superproject(str(tmp_path), submodules=1, branches=5, tags=3)
+    module = os.path.join(project, "modules", "module_0")
+    git(project, "tag", "light", "HEAD~1")
+    tags = ["release_000", "release_002", "light", "master", "origin/branch_1"]
+    assert_reader_matches_git(project, tags)
+    assert_reader_matches_git(module, tags[:2])
+    git(project, "repack", "-a", "-d", "-q")
+    assert_reader_matches_git(project, tags)
+    git(project, "gc", "-q")
+    assert_reader_matches_git(project, tags)
+    git(project, "pack-refs", "--all")
+    assert_reader_matches_git(project, tags)
+
+
+def test_git_info_cache(tmp_path):
+    from execute.git_cache import GitInfoCache
+    project = create_superproject(str(tmp_path / "repos"), submodules=2, tags=2)
+    cache_path = str(tmp_path / "cache" / "git_info.json")
+    expected = get_info(project).to_json()
+
+    cache = GitInfoCache(cache_path)
+    assert get_info(project, cache=cache).to_json() == expected
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    cache = GitInfoCache(cache_path)
+    assert get_info(project, cache=cache).to_json() == expected
+    assert (cache.hits, cache.misses) == (3, 0)
+
+    module = os.path.join(project, "modules", "module_1")
+    git(module, "checkout", "-q", "HEAD~1")
+    cache = GitInfoCache(cache_path, max_entries=2)
+    assert get_info(project, cache=cache).to_json() == get_info(project).to_json()
+    assert (cache.hits, cache.misses) == (2, 1)
+    assert len(cache.entries) == 2
+
+
+def test_git_info_cache_ref_moved_within_mtime_tick(tmp_path):
+    from execute.git_cache import get_fingerprint
+    repo = create_repo(str(tmp_path / "repo"))
+    ref = os.path.join(repo, ".git", "refs", "heads", "master")
+    st = os.stat(ref)
+    fingerprint = get_fingerprint(repo)
+    git(repo, "commit", "-q", "--allow-empty", "-m", "moved")
+    os.utime(ref, (st.st_atime, st.st_mtime))  # a coarse mtime (nfs, fat) did not change
+    assert os.stat(ref).st_size == st.st_size
+    assert get_fingerprint(repo) != fingerprint
+
+
+def test_fast_branch_matches_contains(tmp_path):
+    from execute.git import get_branch
+    repo = str(tmp_path / "repo")
+    hashes = create_history_repo(repo, commits=30, branches=60, branch_tips=5)
+    for checkout, commit in (("master", hashes[-1]), (hashes[-1], hashes[-1]), (hashes[3], hashes[3]),
+                             (hashes[0], hashes[0])):
+        git(repo, "checkout", "-q", checkout)
+        assert get_branch(commit, cwd=repo, fast=True) == get_branch(commit, cwd=repo, fast=False)
+
+
+def test_contains_refs_chunked_by_length(tmp_path, monkeypatch):
+    import execute.git
+    from execute.git import chunk_arguments, find_branch_refs
+    refs = ["refs/remotes/origin/branch_{}".format(i) for i in range(100)]
+    chunks = list(chunk_arguments(refs, 200))
+    assert sum(chunks, []) == refs
+    assert all(sum(len(ref) + 1 for ref in chunk) <= 200 for chunk in chunks)
+    assert list(chunk_arguments(["x" * 300, "y"], 200)) == [["x" * 300], ["y"]]
+
+    repo = str(tmp_path / "repo")
+    hashes = create_history_repo(repo, commits=30, branches=60, branch_tips=20)
+    tips = set(git(repo, "for-each-ref", "--format=%(objectname)", "refs/remotes").split())
+    commit = [commit_hash for commit_hash in hashes if commit_hash not in tips][0]
+    expected = find_branch_refs(commit, repo)
+    assert len(expected) > 1
+    monkeypatch.setattr(execute.git, "CONTAINS_REFS_CHARS_PER_CALL", 100)
+    assert find_branch_refs(commit, repo) == expected
+
+
+def test_git_session_matches_git(tmp_path):
+    from execute.git_session import GitSession
+    import execute.git
+
+    repo = create_repo(str(tmp_path / "repo"), commits=3, tags=2)
+    execute.git.USE_GIT_READER = False
+    try:
+        with GitSession(repo) as session:
+            for tag in ("release_000", "release_001"):
+                assert execute.git.get_tag_hash(tag, repo, session=session) == execute.git.get_tag_hash(tag, repo)
+                assert execute.git.get_tag_date(repo, tag, session=session) == execute.git.get_tag_date(repo, tag)
+            head = execute.git.get_head_hash(repo, session=session)
+            assert head == git(repo, "rev-parse", "HEAD")
+            assert session.rev_parse("release_000") == git(repo, "rev-parse", "release_000")
+            assert execute.git.object_exists(repo, head, session=session)
+            assert not execute.git.object_exists(repo, "no_such_tag", session=session)
+            assert not execute.git.object_exists(repo, "no_such_tag")
+            assert session.commit_hash("no_such_tag") is None
+
+            session.batch_check.process.kill()  # a dead batch process is restarted on the next query
+            session.batch_check.process.wait()
+            session.check("HEAD")
+            assert session.rev_parse("HEAD") == head
+    finally:
+        execute.git.USE_GIT_READER = True
+
+
+def test_tag_index():
+    from execute.git_tags import TagIndex
+    lines = ["running in /repo", "git ls-remote --tags origin",
+             "a" * 40 + "\trefs/tags/release_009", "b" * 40 + "\trefs/tags/release_009^{}",
+             "c" * 40 + "\trefs/tags/release_010", "d" * 40 + "\trefs/tags/other_1", "e" * 40 + "\trefs/tags/nocounter"]
+    index = TagIndex.from_ls_remote(lines)
+    assert len(index) == 4
+    assert "release_009" in index and "running in /repo" not in index
+    assert index.latest("release") == "release_010"
+    assert index.has_counter("release", 9) and not index.has_counter("release", 8)
+    assert index.newer_than("release_009") == "release_010"
+    assert index.newer_than("release_010") is None
+    assert index.latest("missing") is None
+
+
+def test_resolve_tag_on_remote(tmp_path):
+    from execute.git import get_next_tag, get_remote_tag_index, resolve_tag_on_remote
+
+    remote = str(tmp_path / "remote.git")
+    git(str(tmp_path), "init", "-q", "--bare", remote)
+    repo = create_repo(str(tmp_path / "repo"), commits=3, tags=3)
+    git(repo, "config", "remote.origin.url", remote)
+    git(repo, "push", "-q", "origin", "master", "--tags")
+    git(repo, "push", "-q", "origin", "HEAD:refs/tags/release_005", "HEAD:refs/tags/release_4")
+
+    # the last tag is on the remote, a newer tag of the same body wins
+    assert resolve_tag_on_remote(repo, None, fix=True) == "release_005"
+    index = get_remote_tag_index(repo, "release*")
+    assert index.latest("release") == "release_005"
+    assert get_next_tag("release_002", tag_index=index) == "release_006"
+    assert get_next_tag("release_002") == "release_003"
+
+    # a local tag that is not on the remote is deleted
+    git(repo, "commit", "-q", "--allow-empty", "-m", "local")
+    git(repo, "tag", "-a", "-m", "local", "release_003")
+    assert resolve_tag_on_remote(repo, None, fix=True, tag_index=index) == "release_003"
+    assert git(repo, "tag", "--list", "release_003") == ""
+
+
+def test_git_config_format(tmp_path):
+    from execute.git_config import read_config
+    included = tmp_path / "included"
+    included.write_text(u'[user]\n\tname = included\n')
+    config_path = tmp_path / "config"
+    config_path.write_text(u'# comment\n'
+                           u'[core]\n\tbare = false ; trailing comment\n\tsymlinks\n'
+                           u'[remote "Origin"]\n\turl = "https://host/a b.git"  # comment\n'
+                           u'\tfetch = +refs/heads/*:refs/remotes/origin/*\n\tfetch = +refs/tags/*:refs/tags/*\n'
+                           u'[Section.SubSection] key = "quoted \\"value\\"\\t#;" rest\n'
+                           u'[alias]\n\tlong = one \\\n   two\n'
+                           u'[include]\n\tpath = included\n')
+    config = read_config(str(config_path), includes=True)
+    assert config.get("core.bare") == "false"
+    assert config.get("core.symlinks") is True
+    assert config.get("remote.Origin.url") == "https://host/a b.git"
+    assert config.get("remote.origin.url") is None  # subsections are case sensitive
+    assert config.get_all("remote.Origin.fetch") == ["+refs/heads/*:refs/remotes/origin/*", "+refs/tags/*:refs/tags/*"]
+    assert config.get("section.subsection.key") == 'quoted "value"\t#; rest'
+    assert config.get("alias.long") == "one    two"
+    assert config.get("user.name") == "included"
+    assert read_config(str(config_path)).get("user.name") is None
+
+
+def test_find_submodule_tree(tmp_path):
+    from execute.git import GitProject, find_submodule_tree
+
+    def write_modules(path, modules):
+        os.makedirs(path)
+        with open(os.path.join(path, ".gitmodules"), "w") as gitmodules:
+            for name, options in modules:
+                gitmodules.write('[submodule "{}"]\n'.format(name))
+                gitmodules.writelines("\t{} = {}\n".format(key, value) for key, value in options.items())
+
+    root = str(tmp_path / "project")
+    write_modules(root, [("a", {"path": "libs/a", "url": "../a.git", "branch": "dev", "update": "rebase"}),
+                         ("b", {"path": "b", "url": "../b.git"}), ("no-path", {"url": "../c.git"})])
+    write_modules(os.path.join(root, "libs", "a"), [("nested", {"path": "nested", "url": "../nested.git"})])
+    write_modules(os.path.join(root, "libs", "a", "nested"), [])
+    project = GitProject(full_path=root)
+    tree = find_submodule_tree(project)
+    assert [(module.full_path[len(root):], parent.full_path[len(root):] if parent else None)
+            for module, parent in tree] == [("", None), (os.path.join(os.sep + "libs", "a"), ""),
+                                            (os.sep + "b", ""), (os.path.join(os.sep + "libs", "a", "nested"),
+                                                                 os.path.join(os.sep + "libs", "a"))]
+    module_a = project.submodules[0]
+    assert (module_a.name, module_a.relative_url, module_a.tracking_branch, module_a.update) == \
+        ("a", "../a.git", "dev", "rebase")
+    assert [module.name for module in module_a.submodules] == ["nested"]
+
+
+def test_run_git_log_file(tmp_path):
+    from execute.git import run_git
+    from execute.utils import flush_logs, write_log
+    log_path = str(tmp_path / "logs" / "git.log")
+    run_git(["git", "--version"], cwd=str(tmp_path), log_file=log_path)
+    write_log(log_path, "between", console=False)
+    run_git(["git", "--version"], cwd=str(tmp_path), log_file=log_path)
+    flush_logs()
+    with open(log_path) as log:
+        lines = log.read().splitlines()
+    assert len(lines) == 7
+    assert lines[1] == lines[5] == "git --version"
+    assert lines[3] == "between"
+
+
+def test_project_json_round_trip(tmp_path):
+    import io
+    import json
+    from execute.git import GitProject, GitSubmodule
+    project = get_info(create_superproject(str(tmp_path), submodules=2, tags=1))
+    project.submodules[0].submodules = [GitSubmodule(name=u"nésted", path="a b", tracking_branch=True,
+                                                     submodules=[GitSubmodule(name="leaf", path="leaf")])]
+    project.short_summary = ["a", "b"]
+    project.submodules[0].submodules[0].detailed_summary = {"changes": [1, {"b": None, "a": u"é"}], "count": 2}
+    expected = json.dumps(project.to_dict(), sort_keys=True, indent=4)
+    assert project.to_json() == expected
+    stream = io.StringIO()
+    project.dump(stream)
+    assert stream.getvalue() == expected
+    loaded = GitProject.from_json(expected)
+    assert type(loaded) is GitProject and type(loaded.submodules[0].submodules[0]) is GitSubmodule
+    assert loaded.to_json() == expected
+    assert GitProject.from_dict(project.to_dict()).to_json() == expected
+    assert GitProject.from_json(io.StringIO(expected)).to_json() == expected
+
+
+def test_write_log_bounded_and_recreated(tmp_path):
+    import shutil
+    import execute.utils
+    from execute.utils import close_logs, flush_logs, write_log
+    log_dir = tmp_path / "logs"
+    for i in range(execute.utils.MAX_OPEN_LOGS * 3):
+        write_log(str(log_dir / "log_{}.txt".format(i)), "line", console=False)
+    assert len(execute.utils._log_writers) == execute.utils.MAX_OPEN_LOGS
+    flush_logs()
+    assert (log_dir / "log_0.txt").read_text() == u"line\n"
+
+    shutil.rmtree(str(log_dir))
+    last = log_dir / "log_{}.txt".format(execute.utils.MAX_OPEN_LOGS * 3 - 1)
+    write_log(str(last), "again", console=False)
+    write_log(str(log_dir / "new.txt"), "new", console=False)
+    flush_logs()
+    assert last.read_text() == u"again\n"
+    assert (log_dir / "new.txt").read_text() == u"new\n"
+    close_logs()
+
+
+def test_write_log_flushes_off_the_timeout_thread(tmp_path):
+    from execute.scheduler import get_flush_scheduler, get_scheduler
+    from execute.utils import close_logs, get_log_writer
+    writer = get_log_writer(str(tmp_path / "log.txt"))
+    writer.write("line\n")
+    assert writer.flush_call.scheduler is get_flush_scheduler()
+    assert get_flush_scheduler() is not get_scheduler()
+    close_logs()
+
+
+def test_pack_index_cache_is_bounded(tmp_path, monkeypatch):
+    import execute.git_reader
+    from execute.git_reader import GitReader, close_pack_indexes
+    monkeypatch.setattr(execute.git_reader, "MAX_PACK_INDEXES", 2)
+    close_pack_indexes()
+    indexes = []
+    for i in range(4):
+        path = create_repo(str(tmp_path / "repo_{}".format(i)), tags=1)
+        git(path, "repack", "-a", "-d", "-q")
+        assert GitReader(path).commit_hash("release_000") == git(path, "rev-list", "-1", "release_000")
+        indexes.extend(index for _, index in execute.git_reader._pack_index_cache.values() if index not in indexes)
+    assert len(execute.git_reader._pack_index_cache) == 2
+    assert [index.data is None for index in indexes] == [True, True, False, False]
+
+    path = str(tmp_path / "repo_3")
+    git(path, "commit", "-q", "--allow-empty", "-m", "more")
+    git(path, "repack", "-a", "-d", "-q")  # the old pack is replaced
+    assert GitReader(path).commit_hash("release_000") == git(path, "rev-list", "-1", "release_000")
+    assert indexes[-1].data is None
+    close_pack_indexes()
@@ -0,0 +1,44 @@
+import re
+
+from execute.log_file import LogFile
+
+
+def write_log(tmp_path, content):
+    path = tmp_path / "out.log"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_tail(tmp_path):
+    path = write_log(tmp_path, b"  first\nsecond\r\nthird\n\n  \n")
+    with LogFile(path) as log:
+        assert log.tail(2) == ["second", "third"]
+        assert log.tail(10) == ["first", "second", "third"]
+        assert log.tail(1, strip=False) == ["  "]
+    assert LogFile(write_log(tmp_path, b"")).tail(3) == []
+
+
+def test_index_and_grep(tmp_path):
+    path = write_log(tmp_path, b"".join(b"line %d\n" % i for i in range(1000)))
+    log = LogFile(path)
+    assert log.index() == 1000
+    assert log.lines(10, 12) == ["line 10", "line 11"]
+    assert list(log.grep(r"^line 99\d$")) == [(990 + i, "line 99%d" % i) for i in range(10)]
+    assert list(log.grep("LINE 5", flags=re.IGNORECASE, max_count=2)) == [(5, "line 5"), (50, "line 50")]
+
+    with open(path, "ab") as out:
+        out.write(b"last")
+    assert log.index() == 1001
+    assert log.lines(999) == ["line 999", "last"]
+    assert log.line_number(log.size - 1) == 1000
+    log.close()
+
+
+def test_execute_log_access(tmp_path):
+    import sys
+    from execute import run
+    output_path = str(tmp_path / "out.log")
+    result = run([sys.executable, "-c", "for i in range(100): print('line %d' % i)"], output_path, console=False)
+    assert result.get_tail_lines(2) == ["line 98", "line 99"]
+    assert [line for _, line in result.get_log().grep("line 5.")] == ["line %d" % i for i in range(50, 60)]
+    assert result.output_content is None
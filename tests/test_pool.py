@@ -0,0 +1,46 @@
+import os
+import sys
+
+from execute.pool import ExecutePool, run_many
+
+
+def test_run_many_completion_order():
+    cmds = [[sys.executable, "-c", "import time; time.sleep({}); print({})".format(delay, delay)]
+            for delay in (0.6, 0.1, 0.3)]
+    outputs = [result.get_output_lines()[-1] for result in run_many(cmds, max_workers=3)]
+    assert outputs == ["0.1", "0.3", "0.6"]
+
+
+def test_run_many_per_job_arguments():
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    cmds = [{"cmd": [sys.executable, "-c", "import os; print(os.getcwd())"], "cwd": cwd},
+            {"cmd": [sys.executable, "-c", "import os; print(os.environ['POOL_VAR'])"], "env": {"POOL_VAR": "x"}},
+            {"cmd": [sys.executable, "-c", "import time; time.sleep(10)"], "timeout_sec": 0.5}]
+    results = list(run_many(cmds, max_workers=2))
+    assert len(results) == 3
+    assert results[0].get_output_lines()[-1] in (cwd, "x")
+    assert results[-1].timed_out()
+
+
+def test_pool_bounded_workers():
+    with ExecutePool(max_workers=2) as pool:
+        for _ in range(5):
+            pool.submit([sys.executable, "-c", "pass"])
+        results = list(pool.as_completed())
+    assert [r.return_code for r in results] == [0] * 5
+
+
+def test_pool_thread_mode_after_idle(monkeypatch):
+    import execute.pool
+    monkeypatch.setattr(execute.pool, "can_select_pipes", lambda: False)
+    with ExecutePool(max_workers=2) as pool:
+        assert pool.pump is None
+        for _ in range(2):
+            pool.submit([sys.executable, "-c", "print(1)"])
+        results = [pool.completed.get(timeout=10) for _ in range(2)]
+        for thread in pool.threads:
+            thread.join()  # the workers exit on the empty queue
+        pool.submit([sys.executable, "-c", "print(2)"])
+        results.append(pool.completed.get(timeout=10))
+    assert results[-1].get_output_lines()[-1] == "2"
+    assert [r.return_code for r in results] == [0] * 3
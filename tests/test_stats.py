@@ -0,0 +1,52 @@
+import sys
+import json
+
+from execute import run
+from execute.stats import MetricsRegistry, command_metric_name, get_metrics
+
+
+def test_result_stats():
+    code = "import time\n" \
+           "data = bytearray(50 * 1024 * 1024)\n" \
+           "end = time.time() + 0.2\n" \
+           "while time.time() < end: pass\n" \
+           "for i in range(10): print(i)\n"
+    result = run([sys.executable, "-c", code], console=False)
+    stats = result.stats
+    assert result.return_code == 0
+    assert stats.output_lines == 10
+    assert stats.output_bytes == 20
+    assert stats.first_output_sec >= 0.2
+    assert stats.wall_sec == result.duration
+    if stats.user_cpu_sec is not None:
+        assert stats.user_cpu_sec + stats.system_cpu_sec >= 0.1
+        assert stats.max_rss_bytes >= 50 * 1024 * 1024
+
+
+def test_timed_out_result_is_reaped():
+    result = run([sys.executable, "-c", "import time; time.sleep(10)"], console=False, timeout_sec=0.5)
+    assert result.timed_out()
+    assert result.return_code != 0
+
+
+def test_metrics_registry():
+    assert command_metric_name(["/usr/bin/git", "describe", "--long"]) == "git describe"
+    assert command_metric_name(["python", "-c", "pass"]) == "python"
+    assert command_metric_name(["python3", "/tmp/a.py"]) == "python3"
+    assert command_metric_name(["echo", "build-1"]) == command_metric_name(["echo", "build-2"]) == "echo"
+
+    get_metrics().clear()
+    run([sys.executable, "-c", "print(1)"], console=False)
+    run([sys.executable, "-c", "import sys; sys.exit(3)"], console=False)
+    name = command_metric_name([sys.executable])
+    metrics = json.loads(get_metrics().to_json())[name]
+    assert metrics["count"] == 2
+    assert metrics["failures"] == 1
+    assert metrics["output_lines"] == 1
+
+    registry = MetricsRegistry()
+    registry.record(run([sys.executable, "-c", "pass"], console=False), name='step "a"')
+    text = registry.to_prometheus()
+    assert 'execute_commands_total{command="step \\"a\\""} 1' in text
+    assert "# TYPE execute_wall_seconds_total counter" in text
+    assert registry.slowest(1)[0][0] == 'step "a"'